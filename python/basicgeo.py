@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from collections import namedtuple
 
 # cheap verson of normalization
@@ -178,7 +179,7 @@ class Partition1:
         self.lo = lo
         self.hi = hi
         self.nparts = nparts
-        self.vs = [ self.DAlong(i*1.0/nparts)  for i in range(0, nparts+1) ]
+        self.vs = self.DAlong(np.arange(0, nparts+1)*1.0/nparts)
         assert (lo, hi) == (self.vs[0], self.vs[-1])
         assert len(self.vs) == nparts + 1
         
@@ -216,6 +217,29 @@ class Partition1:
             
         assert 0 <= ilo <= ihi <= self.nparts - 1
         return ilo, ihi
+
+    # GetPart of each of the values, the part i with vs[i] <= v < vs[i+1] (the last part includes hi)
+    def GetParts(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        assert np.all((self.lo <= values) & (values <= self.hi)), ("GetParts", "values not between", self.lo, self.hi)
+        return np.minimum(np.searchsorted(self.vs, values, side="right") - 1, self.nparts - 1)
+
+    # GetPartRange of each pair of values as arrays (ilo, ihi), with the same estimate of the part and 
+    # the same single step fix-ups so the ends on the boundaries come out exactly as they do one at a time
+    def GetPartRanges(self, vlos, vhis):
+        vlos, vhis = np.asarray(vlos, dtype=np.float64), np.asarray(vhis, dtype=np.float64)
+        bout = (vhis < self.lo) | (vlos > self.hi)
+        ilo = (self.nparts * (vlos - self.lo) / (self.hi - self.lo)).astype(np.int64)
+        ilo = np.clip(ilo, 0, self.nparts)
+        ilo = np.where((ilo > 0) & (vlos <= self.vs[ilo]), ilo - 1, ilo)
+        
+        ihi = (self.nparts * (vhis - self.lo) / (self.hi - self.lo)).astype(np.int64)
+        bbelow = (ihi < self.nparts - 1)
+        ihi = np.where(bbelow, ihi, self.nparts - 1)
+        ihi = np.where(bbelow & (vhis > self.vs[np.clip(ihi + 1, 0, self.nparts)]), ihi + 1, ihi)
+        
+        assert np.all(bout | ((0 <= ilo) & (ilo <= ihi) & (ihi <= self.nparts - 1)))
+        return np.where(bout, 0, ilo), np.where(bout, -1, ihi)
         
 
 class Quat:
@@ -42,7 +42,7 @@ def remove_files(dir, ext='.png'):
     return
 def get_region_boundary_from_img(img_path, pe, is_reverse=False):
     '''
-    @image_path is an obsolute file path
+    @image_path is an obsolute file path, or the image array of a slice
     @pe is a reference of patheEngine object
     @is_reverse is paramether for generate_contours_from_img
     @return
@@ -200,9 +200,10 @@ def gen_continous_path(ms_info, tmp_slice_path, slice_layers, collision_dist = 3
     remove_files(tmp_slice_path)  
     curdir = os.getcwd()
     out_path = tmp_slice_path+"/slice-%d.png"  
-    real_pixel_size, real_pixel_size, gcode_minx, gcode_miny = stl2pngfunc.stl2png(ms_info.path, N, m.image_width, 
+    images, real_pixel_size, real_pixel_size, gcode_minx, gcode_miny = stl2pngfunc.stl2slices(ms_info.path, N, m.image_width, 
                                                                                    m.image_height, out_path,
-                        func = lambda i: print("slicing layer {}/{}".format(i+1,N))
+                        func = lambda i: print("slicing layer {}/{}".format(i+1,N)),
+                        tris = ms_info.mesh.vectors
                         )    
     #print sequence
     R = [] #R = {r_ij}
@@ -210,7 +211,7 @@ def gen_continous_path(ms_info, tmp_slice_path, slice_layers, collision_dist = 3
     pe = pathengine.pathEngine()  
     
     for i in range(N):
-        img_file = out_path % i
+        img_file = images[i]
         rs = get_region_boundary_from_img(img_file, pe, True)
         for r in rs:
             for c in r:
@@ -55,7 +55,7 @@ def remove_files(dir, ext='.png'):
     return
 def get_region_boundary_from_img(img_path, pe, is_reverse=False):
     '''
-    @image_path is an obsolute file path
+    @image_path is an obsolute file path, or the image array of a slice
     @pe is a reference of patheEngine object
     @is_reverse is paramether for generate_contours_from_img
     @return
@@ -307,9 +307,10 @@ if __name__ == "__main__":
 
     out_path = output_path+"/slice-%d.png"
 
-    real_pixel_size, real_pixel_size, gcode_minx, gcode_miny = stl2pngfunc.stl2png(file_path, N, m.image_width, 
+    images, real_pixel_size, real_pixel_size, gcode_minx, gcode_miny = stl2pngfunc.stl2slices(file_path, N, m.image_width, 
                         m.image_height, out_path,
-                        func = lambda i: print("slicing layer {}/{}".format(i+1,N))
+                        func = lambda i: print("slicing layer {}/{}".format(i+1,N)),
+                        tris = m.mesh.vectors
                         )
 
     print('Slicing mesh into ' + out_path)
@@ -321,7 +322,7 @@ if __name__ == "__main__":
     R = []
 
     for i in range(N):
-        img_file = out_path % i
+        img_file = images[i]
         rs = get_region_boundary_from_img(img_file, pe, True)
         for r in rs:
             for c in r:
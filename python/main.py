@@ -7,7 +7,7 @@ import pyqtgraph as pg
 from pyqtgraph.Qt import QtGui, QtCore
 from PyQt5.QtGui import(QFont, QIcon, QImage) 
 from PyQt5.QtCore import QCoreApplication
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtWidgets import (QHBoxLayout, QVBoxLayout,QGridLayout, QMainWindow,  QAction, qApp, QWidget, QToolTip, 
     QPushButton, QApplication, QLabel, QTextEdit, QFileDialog, QSlider)
 
@@ -23,6 +23,35 @@ import stl2pngfunc
 import modelInfo
 import pathengine
 import mkspiral
+import progressiveslice
+
+
+# previews then refines the layers of a ProgressiveSlicer off the GUI thread, the viewed layer and its neighbours first
+# each finished layer is posted back with a signal, iview is set from the GUI as the slider moves
+class SliceWorker(QThread):
+    previewed = pyqtSignal(int, object)   # layer, coarse image
+    refined = pyqtSignal(int, object)   # layer, (image, ix0, iy0)
+    
+    def __init__(self, progressive, iview=0):
+        super().__init__()
+        self.progressive = progressive
+        self.iview = iview
+        self.stopped = False
+        
+    def run(self):
+        while not self.stopped:
+            i = self.progressive.CoarseNext(self.iview)
+            if i is not None:
+                self.previewed.emit(i, self.progressive.coarseimages[i])
+                continue
+            i = self.progressive.RefineNext(self.iview)
+            if i is None:
+                return
+            self.refined.emit(i, self.progressive.rois[i])
+            
+    def stop(self):
+        self.stopped = True
+        self.wait()
 
 
 class VView(QMainWindow):
@@ -47,7 +76,8 @@ class VView(QMainWindow):
         self.mesh_info = modelInfo.ModelInfo()
        
         self.slices = {}
-        self.out_path = ""
+        self.progressive = None   # coarse previews of the slices while they are refined
+        self.slice_worker = None   # SliceWorker previewing and refining the layers of self.progressive
         
         self.is_fill_path = False        
         
@@ -127,6 +157,8 @@ class VView(QMainWindow):
         self.widget_arr['layer_thickness_edit'] = QtGui.QLineEdit();
         self.widget_arr['layer_thickness_edit'].textChanged.connect(self.update_variable_layer_thickness)
         
+        self.widget_arr['adaptive_layers'] = QtGui.QCheckBox('Adaptive Layer Thickness')
+        
    
         # Add widgets     
         for wt in self.widget_arr.values():            
@@ -213,7 +245,7 @@ class VView(QMainWindow):
     def openStlDialog(self):
 
         fname = QFileDialog.getOpenFileName(self, 'Open file', '', 
-                                            "Mesh (*.stl);")
+                                            "Mesh (*.stl *.off *.obj);")
 
         if fname[0]:
             ext_file = path.splitext(fname[0])[1]
@@ -276,33 +308,28 @@ class VView(QMainWindow):
             self.message('Load mesh first!')
             return
         
+        self.stop_slice_worker()
         self.slices.clear()
-        curdir = os.getcwd()        
-        if(path.isdir("images")):
-            #remove all files in images
-            filelist = [ f for f in os.listdir("./images") if f.endswith(".png") ]            
-            for f in filelist:
-                os.remove(os.path.join(curdir+"/images", f))  
+        if self.widget_arr['adaptive_layers'].isChecked():
+            self.mesh_info.set_adaptive_layers()
         else:
-            os.mkdir("images")
-        self.out_path = os.path.join(curdir, "images/slice-%d.png")
+            self.mesh_info.init(self.mesh_info.pixel_size, self.mesh_info.first_layer_thickness, self.mesh_info.layer_thickness)
      
         self.message('Slicing mesh...')
         
+        # the first layer is shown coarse straight away, then a SliceWorker previews the rest and works them up to
+        # full resolution from the one being viewed outwards, kept in memory as (image, ix0, iy0) of only the pixels each layer occupies
         str_layers = str(self.mesh_info.get_layers())
-        self.mesh_info.real_pixel_size, self.mesh_info.real_pixel_size, self.gcode_minx, self.gcode_miny = stl2pngfunc.stl2png(self.model_path, self.mesh_info.get_layers(), self.mesh_info.image_width, 
-                            self.mesh_info.image_height, self.out_path,
-                            func = lambda i: self.message("slicing layer " + str(i+1) + "/" + str_layers, False)
+        tzs, self.mesh_info.real_pixel_size, self.mesh_info.real_pixel_size, self.gcode_minx, self.gcode_miny = stl2pngfunc.loadslicer(self.model_path, self.mesh_info.image_width, 
+                            self.mesh_info.image_height,
+                            tris = self.mesh_info.get_slice_mesh()
                             )
-        self.message('Slicing mesh into ' + self.out_path)
+        self.progressive = progressiveslice.ProgressiveSlicer(tzs, stl2pngfunc.layerzs(tzs, self.mesh_info.get_slice_layers()))
+        if self.progressive.zs:
+            self.progressive.GetCoarse(0)
+        self.message('Previewing ' + str_layers + ' layers while slicing them')
         self.message(self.mesh_info.get_info() )
         
-        im = cv2.imread(self.out_path % 0)
-        tex1 = cv2.cvtColor(im, cv2.COLOR_BGR2RGBA) 
-        v1 = gl.GLImageItem(tex1)
-        v1.translate(0, 0, 0)        
-        self.view_slice.addItem(v1)  
-        
         # activate slider 
         self.sl.setMinimum(0)
         self.sl.setMaximum(self.mesh_info.get_layers() - 1)  
@@ -310,8 +337,39 @@ class VView(QMainWindow):
         self.sl.setTickPosition(QSlider.TicksBelow)
         self.sl.setTickInterval(1) 
         self.sl.valueChanged.connect(self.show_slice)
+        self.show_slice()
+        self.slice_worker = SliceWorker(self.progressive, self.sl.value())
+        self.slice_worker.previewed.connect(self.previewed_slice)
+        self.slice_worker.refined.connect(self.refined_slice)
+        self.slice_worker.finished.connect(self.sliced)
+        self.slice_worker.start()
         return
     
+    def stop_slice_worker(self):
+        if self.slice_worker is not None:
+            self.slice_worker.stop()
+            self.slice_worker = None
+    
+    # layers posted by a worker stopped since are dropped
+    def previewed_slice(self, i, im):
+        if self.sender() is self.slice_worker and i == self.sl.value():
+            self.show_slice()
+    
+    def refined_slice(self, i, roi):
+        if self.sender() is not self.slice_worker:
+            return
+        self.slices[i] = roi
+        if i == self.sl.value():
+            self.show_slice()
+    
+    def sliced(self):
+        if self.sender() is self.slice_worker:
+            self.message('Sliced mesh into ' + str(len(self.slices)) + ' layers')
+    
+    def closeEvent(self, event):
+        self.stop_slice_worker()
+        event.accept()
+    
     def print_sequence(self):
         try:
             self.message("Generate print sequence...")
@@ -321,12 +379,12 @@ class VView(QMainWindow):
         try:
             i = self.sl.value()
             self.message("Show slice {}.".format(i+1), False)
-            curdir = os.getcwd()
-            filepath = self.out_path % i
             offset = -6
             line_width = 1#int(abs(offset)/2)
             pe = pathengine.pathEngine()    
-            pe.generate_contours_from_img(filepath, True)
+            self.slices[i] = self.progressive.GetROI(i)
+            im, ix0, iy0 = self.slices[i]
+            pe.generate_contours_from_img(im, True)
             pe.im = cv2.cvtColor(pe.im, cv2.COLOR_GRAY2BGR)
             contour_tree = pe.convert_hiearchy_to_PyPolyTree()  
             group_contour = pe.get_contours_from_each_connected_region(contour_tree, '0')
@@ -352,11 +410,10 @@ class VView(QMainWindow):
                         pathengine.suPath2D.draw_line(np.vstack([c, c[0]]), pe.im, colors[idx],line_width) 
                     idx += 1
             
-            cv2.imwrite(filepath, pe.im)
             tex1 = cv2.cvtColor(pe.im, cv2.COLOR_BGR2RGBA) 
             v1 = gl.GLImageItem(tex1)
             
-            v1.translate(0, 0, i * self.mesh_info.layer_thickness)        
+            v1.translate(iy0, ix0, self.mesh_info.get_layer_offset(i))        
             self.view_slice.items = []
             self.view_slice.addItem(v1)            
         
@@ -382,8 +439,12 @@ class VView(QMainWindow):
         if self.mesh_info.mesh == None:
             return
         self.view_slice.items = [] 
-        self.mesh_info.init(self.mesh_info.pixel_size, self.mesh_info.first_layer_thickness, self.mesh_info.layer_thickness)
-        pts = mkspiral.gen_continous_path(self.mesh_info, "d:/images", self.mesh_info.get_layers(), 40, -10)
+        if self.widget_arr['adaptive_layers'].isChecked():
+            self.mesh_info.set_adaptive_layers()
+            pts = mkspiral.gen_continous_path(self.mesh_info, None, None, 40, -10)
+        else:
+            self.mesh_info.init(self.mesh_info.pixel_size, self.mesh_info.first_layer_thickness, self.mesh_info.layer_thickness)
+            pts = mkspiral.gen_continous_path(self.mesh_info, None, self.mesh_info.get_layers(), 40, -10)
             
         plt = gl.GLLinePlotItem(pos=pts, color=pg.glColor('r'), width= 1, antialias=True)
         self.view_slice.addItem(plt)      
@@ -392,14 +453,23 @@ class VView(QMainWindow):
     def show_slice(self):
         i = self.sl.value()
         self.message("Show slice {}.".format(i+1), False)
-        curdir = os.getcwd()
-        
-        im = cv2.imread(self.out_path % i)
-        #self.slices[i] = im
-        tex1 = cv2.cvtColor(im, cv2.COLOR_BGR2RGBA) 
+        if self.slice_worker is not None:
+            self.slice_worker.iview = i
+        
+        if i in self.slices:
+            im, ix0, iy0 = self.slices[i]
+            sx, sy = 1, 1
+        elif self.progressive.coarseimages[i] is not None:   # still the coarse preview
+            im, ix0, iy0 = self.progressive.coarseimages[i], 0, 0
+            sx, sy = self.progressive.coarsescale
+        else:   # the worker has not got to it yet
+            self.view_slice.items = []
+            return
+        tex1 = cv2.cvtColor(im, cv2.COLOR_GRAY2RGBA) 
         v1 = gl.GLImageItem(tex1)
+        v1.scale(sy, sx, 1)   # the image rows run along x
         
-        v1.translate(0, 0, i * self.mesh_info.layer_thickness)        
+        v1.translate(iy0, ix0, self.mesh_info.get_layer_offset(i))        
         self.view_slice.items = []
         self.view_slice.addItem(v1)
         
@@ -0,0 +1,66 @@
+import os, hashlib, tempfile
+import numpy as np
+from trianglebarmesh import TriangleBarMeshArrays
+
+# on-disk cache of welded meshes, so reslicing the same file skips the parse and the build
+# entries are keyed by the file contents, the transform name and the node sort order
+# and are evicted least recently used first once the directory holds more than maxbytes
+class MeshCache:
+    def __init__(self, cachedir, maxbytes=1<<30):
+        self.cachedir = cachedir
+        self.maxbytes = maxbytes
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir)
+
+    @staticmethod
+    def FileHash(fname):
+        h = hashlib.blake2b()
+        with open(fname, "rb") as fin:
+            for block in iter(lambda: fin.read(1<<20), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def CacheFile(self, fname, transname, nodesortaxes):
+        h = hashlib.blake2b(self.FileHash(fname).encode("ascii"))
+        h.update(repr((transname, tuple(nodesortaxes))).encode("ascii"))
+        return os.path.join(self.cachedir, h.hexdigest()[:40] + ".npz")
+
+    # transname identifies trans (eg the key into the transmaps of stl2png) as functions cannot be hashed
+    def GetMesh(self, fname, trans, transname, nodesortaxes=(0, 1, 2), maxmemory=None):
+        cfile = self.CacheFile(fname, transname, nodesortaxes)
+        tbm = TriangleBarMeshArrays(nodesortaxes=nodesortaxes)
+        if os.path.isfile(cfile):
+            with np.load(cfile) as d:
+                tbm.SetArrays(d["nodes"], d["nodeback"], d["nodefore"], d["barforeright"], d["barbackleft"])
+            os.utime(cfile)   # mark as recently used
+            return tbm
+        
+        tbm = TriangleBarMeshArrays(fname, trans, nodesortaxes=nodesortaxes, maxbytes=maxmemory)
+        fd, tmpfile = tempfile.mkstemp(suffix=".npz.tmp", dir=self.cachedir)
+        with os.fdopen(fd, "wb") as fout:
+            np.savez(fout, nodes=tbm.nodes, nodeback=tbm.nodeback, nodefore=tbm.nodefore, 
+                     barforeright=tbm.barforeright, barbackleft=tbm.barbackleft)
+        os.replace(tmpfile, cfile)
+        self.Evict(keep=cfile)
+        return tbm
+
+    def Evict(self, keep=None):
+        entries = [ ]
+        for f in os.listdir(self.cachedir):
+            if f.endswith(".npz"):
+                try:
+                    st = os.stat(os.path.join(self.cachedir, f))
+                except FileNotFoundError:   # evicted by another process sharing the directory
+                    continue
+                entries.append((st.st_mtime, st.st_size, os.path.join(self.cachedir, f)))
+        entries.sort()
+        totalbytes = sum(e[1]  for e in entries)
+        for mtime, size, cfile in entries:
+            if totalbytes <= self.maxbytes:
+                break
+            if cfile != keep:
+                try:
+                    os.remove(cfile)
+                except FileNotFoundError:
+                    pass
+                totalbytes -= size
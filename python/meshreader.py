@@ -0,0 +1,80 @@
+import re, os
+import numpy as np
+import stlgenerator
+
+# readers for the indexed mesh formats (OFF as used by the C++ side, and OBJ)
+# each returns vertices (V, 3) float64 and triangles (N, 3) int64 of vertex indices
+# without going through per vertex python parsing, polygons are split into fans of triangles
+
+indexedexts = (".off", ".obj")
+
+def bindexedfile(fname):
+    return os.path.splitext(fname)[1].lower() in indexedexts
+
+# counts[i] is the number of corners of polygon i and flat its concatenated vertex indices
+def fantriangles(counts, flat):
+    starts = np.cumsum(counts) - counts
+    ntri = np.maximum(counts - 2, 0)
+    s = np.repeat(starts, ntri)
+    k = np.arange(ntri.sum()) - np.repeat(np.cumsum(ntri) - ntri, ntri)   # index of the triangle within its fan
+    return np.stack((flat[s], flat[s + k + 1], flat[s + k + 2]), axis=1)
+
+def polygonindexes(lfaces, fname):
+    counts = np.fromiter((len(l.split())  for l in lfaces), dtype=np.int64, count=len(lfaces))
+    flat = np.fromstring(b" ".join(lfaces).decode("ascii"), dtype=np.int64, sep=" ")
+    if len(flat) != counts.sum():
+        raise ValueError("bad face line in %s" % fname)
+    return counts, flat
+
+def offreader(fname):
+    text = re.sub(rb"#[^\n]*", b"", open(fname, "rb").read())
+    lines = [ l  for l in text.split(b"\n")  if l.strip() ]
+    header = lines[0].split()
+    if not header[0].endswith(b"OFF"):
+        raise ValueError("%s is not an OFF file" % fname)
+    if len(header) >= 3:   # counts on the same line as OFF
+        nv, nf = int(header[1]), int(header[2])
+        i0 = 1
+    else:
+        nv, nf = map(int, lines[1].split()[:2])
+        i0 = 2
+    verts = np.fromstring(b" ".join(lines[i0:i0+nv]).decode("ascii"), dtype=np.float64, sep=" ")
+    if nv == 0 or len(verts) % nv != 0:
+        raise ValueError("bad vertex lines in %s" % fname)
+    verts = verts.reshape(nv, -1)[:, :3]   # any colours or normals after the coordinates are dropped
+    
+    lfaces = lines[i0+nv:i0+nv+nf]
+    flat = np.fromstring(b" ".join(lfaces).decode("ascii"), dtype=np.float64, sep=" ").astype(np.int64)
+    if nf and len(flat) % nf == 0 and np.all(flat[::len(flat)//nf] == flat[0]) and len(flat)//nf >= flat[0] + 1:
+        rows = flat.reshape(nf, -1)   # all faces have the same number of corners
+        n = int(rows[0, 0])
+        counts, flat = np.full(nf, n), rows[:, 1:n+1].reshape(-1)
+    else:
+        counts, flat = polygonindexes([ b" ".join(l.split()[1:int(l.split()[0])+1])  for l in lfaces ], fname)
+    return verts, fantriangles(counts, flat)
+
+def objreader(fname):
+    text = open(fname, "rb").read()
+    verts = np.fromstring(b" ".join(re.findall(rb"^v[ \t]+([^\r\n]*)", text, re.M)).decode("ascii"), dtype=np.float64, sep=" ")
+    nv = len(re.findall(rb"^v[ \t]", text, re.M))
+    if nv == 0 or len(verts) % nv != 0:
+        raise ValueError("bad vertex lines in %s" % fname)
+    verts = verts.reshape(nv, -1)[:, :3]   # drop optional w or vertex colours
+    
+    lfaces = [ re.sub(rb"/\S*", b"", l)  for l in re.findall(rb"^f[ \t]+([^\r\n]*)", text, re.M) ]  # keep only the vertex of v/vt/vn
+    counts, flat = polygonindexes(lfaces, fname)
+    if np.any(flat < 0):   # negative indices count back from the last vertex before the face
+        vstarts = np.array([ m.start()  for m in re.finditer(rb"^v[ \t]", text, re.M) ])
+        fstarts = np.array([ m.start()  for m in re.finditer(rb"^f[ \t]", text, re.M) ])
+        nvbefore = np.repeat(np.searchsorted(vstarts, fstarts), counts)
+        flat = np.where(flat < 0, nvbefore + flat, flat - 1)
+    else:
+        flat = flat - 1
+    return verts, fantriangles(counts, flat)
+
+def indexedreader(fname, trans=None):
+    if os.path.splitext(fname)[1].lower() == ".off":
+        verts, faces = offreader(fname)
+    else:
+        verts, faces = objreader(fname)
+    return stlgenerator.transarray(verts, trans), faces
@@ -40,15 +40,16 @@ def remove_files(dir, ext='.png'):
     else:
         os.mkdir(dir)    
     return
-def get_region_boundary_from_img(img_path, pe, is_reverse=False):
+def get_region_boundary_from_img(img_path, pe, is_reverse=False, origin=(0, 0)):
     '''
-    @image_path is an obsolute file path
+    @image_path is an obsolute file path, or the image array of a slice
     @pe is a reference of patheEngine object
     @is_reverse is paramether for generate_contours_from_img
+    @origin is the pixel of the image's corner when it only covers part of the slice
     @return
        a list, each element represents a group of boundaries of a connected region.
     '''
-    pe.generate_contours_from_img(img_path, is_reverse)
+    pe.generate_contours_from_img(img_path, is_reverse, origin)
     contour_tree = pe.convert_hiearchy_to_PyPolyTree()
     group_boundary = pe.get_contours_from_each_connected_region(contour_tree, '0')
     #closed region
@@ -192,26 +193,40 @@ def spiral(pe, boundary,offset):
 ###########################
 def gen_continous_path(ms_info, tmp_slice_path, slice_layers, collision_dist = 3, offset = -4):
     dist_th = collision_dist
-    N = slice_layers     
     m = ms_info
-    m.set_layers(N)
+    if slice_layers is not None:
+        N = slice_layers     
+        m.set_layers(N)
+        layers = N
+    else:   # the layers already planned on ms_info, eg by set_adaptive_layers()
+        N = m.get_layers()
+        layers = m.get_slice_layers()
     
-    #slicing
-    remove_files(tmp_slice_path)  
-    curdir = os.getcwd()
-    out_path = tmp_slice_path+"/slice-%d.png"  
-    real_pixel_size, real_pixel_size, gcode_minx, gcode_miny = stl2pngfunc.stl2png(ms_info.path, N, m.image_width, 
-                                                                                   m.image_height, out_path,
-                        func = lambda i: print("slicing layer {}/{}".format(i+1,N))
-                        )    
+    #slicing in memory, the layers are only written out to one volume file when tmp_slice_path is given
+    # otherwise each layer is only rasterized over the pixels it occupies
+    if tmp_slice_path is not None:
+        if not os.path.isdir(tmp_slice_path):
+            os.mkdir(tmp_slice_path)
+        volume, real_pixel_size, real_pixel_size, gcode_minx, gcode_miny = stl2pngfunc.stl2volume(ms_info.path, layers, m.image_width, 
+                                                                                       m.image_height, os.path.join(tmp_slice_path, "slices.vol"),
+                            func = lambda i: print("slicing layer {}/{}".format(i+1,N)),
+                            tris = ms_info.get_slice_mesh()
+                            )    
+        rois = [ (volume[i], 0, 0)  for i in range(len(volume)) ]
+    else:
+        rois, real_pixel_size, real_pixel_size, gcode_minx, gcode_miny = stl2pngfunc.stl2rois(ms_info.path, layers, m.image_width, 
+                                                                                       m.image_height,
+                            func = lambda i: print("slicing layer {}/{}".format(i+1,N)),
+                            tris = ms_info.get_slice_mesh()
+                            )    
     #print sequence
     R = [] #R = {r_ij}
     S = [] #sequence with [[i,j]......]    
     pe = pathengine.pathEngine()  
     
     for i in range(N):
-        img_file = out_path % i
-        rs = get_region_boundary_from_img(img_file, pe, True)
+        img_file, ix0, iy0 = rois[i]
+        rs = get_region_boundary_from_img(img_file, pe, True, (ix0, iy0))
         for r in rs:
             for c in r:
                 print(c.shape)
@@ -261,10 +276,7 @@ def gen_continous_path(ms_info, tmp_slice_path, slice_layers, collision_dist = 3
         if i== 0:
             path = np.hstack([cs,z])            
         else:
-            if iLayer == 1:
-                z += ms_info.first_layer_thickness
-            elif iLayer > 1:
-                z += ((iLayer-1) * ms_info.layer_thickness + ms_info.first_layer_thickness)
+            z += ms_info.get_layer_offset(iLayer)
             cs = np.hstack([cs,z])
             path = np.vstack([path,cs])
             
@@ -281,6 +293,7 @@ if __name__ == "__main__":
     parser.add_argument('--stl-file', dest='stl_file', required=True)
     parser.add_argument('--output-path', dest='output_path', required=False)
     parser.add_argument('--slice-layers', dest='N', required=False)
+    parser.add_argument('--adaptive-layers', dest='adaptive', action='store_true', help='vary the layer thickness with the facet slopes instead of --slice-layers')
     args = parser.parse_args()
     
     N = 10
@@ -296,6 +309,8 @@ if __name__ == "__main__":
     ms = mesh.Mesh.from_file(file_path)
     m = modelInfo.ModelInfo(ms)
     m.path = file_path
+    if args.adaptive:
+        m.set_adaptive_layers()
     
-    path = gen_continous_path(m, "r:/images", N, 3)
+    path = gen_continous_path(m, "r:/images", None if args.adaptive else N, 3)
     print(path.shape)
\ No newline at end of file
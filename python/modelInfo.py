@@ -1,20 +1,36 @@
 import math
 import numpy as np
-import stl
 from stl import mesh
+import stlgenerator
+import meshreader
 
 '''
 A class for holding the infomation of mesh
 Default unit is milimeter
 '''
 
+def mesh_from_array(tris):
+    '''
+    wrap triangles from stlgenerator.stlreadrecords (no copy) or
+    a (N, 3, 3) array of corners as a numpy-stl mesh
+    '''
+    if tris.dtype.names is None:
+        data = np.zeros(tris.shape[0], dtype=mesh.Mesh.dtype)
+        data['vectors'] = tris
+        return mesh.Mesh(data)
+    return mesh.Mesh(tris, calculate_normals=False)
+
 class ModelInfo():
     def __init__(self, mesh = None):
+        if isinstance(mesh, np.ndarray):
+            mesh = mesh_from_array(mesh)
         self.mesh = mesh
+        self.verts = self.faces = None   # the shared corners when loaded from an OFF or OBJ, mesh is expanded from them
         if (mesh != None):            
             self.minx, self.maxx, self.miny, self.maxy, self.minz, self.maxz = self.find_mins_maxs()
         else:
             self.minx, self.maxx, self.miny, self.maxy, self.minz, self.maxz  = 0,0,0,0,0,0
+        self.metrics = {}         # lazily computed mesh measurements, see get_metric()
         self.set_pixel_size(0.1)
         self.set_image_size()
         self.gcode_minx = 0       # for record minx and miny from slice result
@@ -22,15 +38,32 @@ class ModelInfo():
         
         self.first_layer_thickness = 0.35
         self.layer_thickness = 0.5
+        self.layer_bottoms = None  # bottom z of each layer when they vary, see set_adaptive_layers()
+        self.layer_thicknesses = None
         self.path = ""
         
         return
     
-    def load(self, file_path):
-        self.mesh = mesh.Mesh.from_file(file_path)
+    def load(self, file_path, mapped=True):
+        '''
+        @mapped keeps the facets of a binary STL memory mapped (copy-on-write, so the mesh can still be
+                transformed) rather than read into memory, the file stays open while the mesh is held 
+                which on Windows stops it being overwritten
+        '''
+        if meshreader.bindexedfile(file_path):
+            self.verts, self.faces = meshreader.indexedreader(file_path)
+            self.mesh = mesh_from_array(self.verts[self.faces])
+        elif stlgenerator.stlbbinarysize(file_path):
+            tris = stlgenerator.stlreadrecords(file_path, mode="c")
+            self.mesh = mesh_from_array(tris if mapped else np.array(tris))
+            self.verts = self.faces = None
+        else:   # ASCII, or a binary file whose facet count is off, which numpy-stl sorts out
+            self.mesh = mesh.Mesh.from_file(file_path)
+            self.verts = self.faces = None
         if self.mesh == None:
             return
         self.path = file_path
+        self.metrics = {}
         self.minx, self.maxx, self.miny, self.maxy, self.minz, self.maxz = self.find_mins_maxs()
         self.init(self.pixel_size, self.first_layer_thickness, self.layer_thickness)
         return self.mesh
@@ -40,6 +73,7 @@ class ModelInfo():
         self.set_pixel_size(pixel_size)
         self.first_layer_thickness = first_layer_thickness
         self.layer_thickness = layer_thickness
+        self.layer_bottoms = self.layer_thicknesses = None
         self.set_image_size()
         
     def get_info(self):
@@ -64,6 +98,7 @@ class ModelInfo():
         height = self.maxz - self.minz
         self.layer_thickness = height / nLayers
         self.first_layer_thickness = self.layer_thickness 
+        self.layer_bottoms = self.layer_thicknesses = None
         
         
     def set_image_size(self):
@@ -84,28 +119,173 @@ class ModelInfo():
         return self.pixel_size
     
     def get_layers(self):        
+        if self.layer_bottoms is not None:
+            return len(self.layer_bottoms)
         nlayers = math.ceil(((self.maxz - self.minz) - self.first_layer_thickness ) / self.layer_thickness )  + 1
         return nlayers
+
+    def get_layer_offset(self, i):
+        '''
+        height of the bottom of layer i above the bottom of the model
+        '''
+        if self.layer_bottoms is not None:
+            return float(self.layer_bottoms[i] - self.minz)
+        if i == 0:
+            return 0.0
+        return (i - 1) * self.layer_thickness + self.first_layer_thickness
+
+    def get_slice_layers(self):
+        '''
+        what to pass as nlayers to the stl2pngfunc slicers, the z of the middle of each layer
+        when they are adaptive or else the number of equal layers
+        '''
+        if self.layer_bottoms is not None:
+            return (self.layer_bottoms + self.layer_thicknesses*0.5).tolist()
+        return self.get_layers()
+
+    def plan_adaptive_layers(self, min_thickness=None, max_thickness=None, max_cusp=None, max_area_change=0.5):
+        '''
+        layers of varying thickness over [minz, maxz] after a first layer of first_layer_thickness,
+        thick along vertical walls and thin where
+          - the facets slope, so the stair step across a layer (thickness*|normal z|) stays under max_cusp
+          - the cross-section area changes by more than the fraction max_area_change over the layer
+        the cross-section area at z is minus the sum of the normal z weighted facet area below z
+        defaults are from layer_thickness: layers from 1/2 to 2 times it, with max_cusp equal to it
+        so the steps are no worse than those of equal layers on their flattest facets
+        return (bottoms, thicknesses) of the layers
+        '''
+        min_thickness = min_thickness or self.layer_thickness*0.5
+        max_thickness = max_thickness or self.layer_thickness*2
+        max_cusp = max_cusp or self.layer_thickness
+        height = self.maxz - self.minz
+        nbins = max(1, int(math.ceil(height/(min_thickness*0.5))))
+        binz = height/nbins
+        tris = self.mesh.vectors.astype(np.float64)
+        zlo, zhi = tris[:,:,2].min(axis=1), tris[:,:,2].max(axis=1)
+        blo = np.clip(((zlo - self.minz)/binz).astype(np.int64), 0, nbins - 1)
+        bhi = np.clip(((zhi - self.minz)/binz).astype(np.int64), 0, nbins - 1)
+        norms = np.cross(tris[:,1] - tris[:,0], tris[:,2] - tris[:,0])
+        areas = np.sqrt((norms**2).sum(axis=1))
+        anz = np.abs(norms[:,2])/np.where(areas != 0, areas, 1)
+
+        # thickest layer allowed by the steepest facet through each bin (only facets which limit it are spread out)
+        bsteep = (anz*max_thickness > max_cusp)
+        counts = (bhi - blo + 1)[bsteep]
+        ioffs = np.cumsum(counts) - counts
+        ibins = np.repeat(blo[bsteep] - ioffs, counts) + np.arange(counts.sum())
+        binnz = np.zeros(nbins)
+        np.maximum.at(binnz, ibins, np.repeat(anz[bsteep], counts))
+        binthick = np.clip(max_cusp/np.maximum(binnz, 1e-12), min_thickness, max_thickness)
+
+        # cross-section area at the bin edges with each facet's area spread evenly over its bins
+        counts = bhi - blo + 1
+        ioffs = np.cumsum(counts) - counts
+        ibins = np.repeat(blo - ioffs, counts) + np.arange(counts.sum())
+        binda = np.bincount(ibins, weights=np.repeat(norms[:,2]*0.5/counts, counts), minlength=nbins)
+        edgeareas = np.abs(np.concatenate(([0.0], -np.cumsum(binda))))
+        edgezs = self.minz + np.arange(nbins + 1)*binz
+
+        def area_change(z0, z1):
+            a0, a1 = np.interp([z0, z1], edgezs, edgeareas)
+            return abs(a1 - a0)/max(a0, a1, 1e-12)
+
+        bottoms, thicknesses = [ self.minz ], [ min(self.first_layer_thickness, height) ]
+        z = self.minz + thicknesses[0]
+        while z < self.maxz - 1e-9:
+            t = max_thickness
+            while True:   # shrink until the steepest facet within the layer allows it
+                b0, b1 = int((z - self.minz)/binz), int(math.ceil((z + t - self.minz)/binz))
+                tallowed = max(min_thickness, binthick[min(b0, nbins - 1):max(b1, b0 + 1)].min())
+                if tallowed >= t:
+                    break
+                t = tallowed
+            while t > min_thickness and area_change(z, z + t) > max_area_change:
+                t = max(min_thickness, t*0.75)
+            remains = self.maxz - z
+            if remains - t < min_thickness:   # no sliver of a layer at the top
+                t = remains if remains <= max_thickness else remains*0.5
+            bottoms.append(z)
+            thicknesses.append(t)
+            z += t
+        return np.array(bottoms), np.array(thicknesses)
+
+    def set_adaptive_layers(self, min_thickness=None, max_thickness=None, max_cusp=None, max_area_change=0.5):
+        '''
+        use adaptive layers (see plan_adaptive_layers) until set_layers() or init() goes back to equal ones
+        '''
+        self.layer_bottoms, self.layer_thicknesses = self.plan_adaptive_layers(min_thickness, max_thickness, max_cusp, max_area_change)
+        return self.get_layers()
         
+    def get_slice_mesh(self):
+        '''
+        the mesh to hand to stl2pngfunc as tris, (verts, faces) when it was loaded indexed
+        so the slicer does not weld the corners of the expanded triangles back together
+        '''
+        if self.verts is not None:
+            return self.verts, self.faces
+        return self.mesh.vectors
+    
     def find_mins_maxs(self):
-        minx = maxx = miny = maxy = minz = maxz = None
-        for p in self.mesh.points:
-            # p contains (x, y, z)
-            if minx is None:
-                minx = p[stl.Dimension.X]
-                maxx = p[stl.Dimension.X]
-                miny = p[stl.Dimension.Y]
-                maxy = p[stl.Dimension.Y]
-                minz = p[stl.Dimension.Z]
-                maxz = p[stl.Dimension.Z]
-            else:
-                maxx = max(p[stl.Dimension.X], maxx)
-                minx = min(p[stl.Dimension.X], minx)
-                maxy = max(p[stl.Dimension.Y], maxy)
-                miny = min(p[stl.Dimension.Y], miny)
-                maxz = max(p[stl.Dimension.Z], maxz)
-                minz = min(p[stl.Dimension.Z], minz)
-        return minx, maxx, miny, maxy, minz, maxz    
+        pts = self.mesh.vectors.reshape(-1, 3)
+        if len(pts) == 0:
+            return None, None, None, None, None, None
+        lo = pts.min(axis=0)
+        hi = pts.max(axis=0)
+        return lo[0], hi[0], lo[1], hi[1], lo[2], hi[2]
+    
+    def get_metric(self, name, func):
+        '''
+        compute func() once per loaded mesh and keep the result under name
+        '''
+        if name not in self.metrics:
+            self.metrics[name] = func()
+        return self.metrics[name]
+    
+    def get_triangle_count(self):
+        return len(self.mesh.vectors)
+    
+    def get_surface_area(self):
+        def calc():
+            v = self.mesh.vectors.astype(np.float64)
+            return 0.5 * np.linalg.norm(np.cross(v[:,1] - v[:,0], v[:,2] - v[:,0]), axis=1).sum()
+        return self.get_metric('surface_area', calc)
+    
+    def get_volume(self):
+        '''
+        enclosed volume by the divergence theorem, only meaningful for a closed mesh
+        '''
+        def calc():
+            v = self.mesh.vectors.astype(np.float64)
+            return np.einsum('ij,ij->i', v[:,0], np.cross(v[:,1], v[:,2])).sum() / 6.0
+        return self.get_metric('volume', calc)
+    
+    def get_nonmanifold_edge_count(self):
+        '''
+        number of edges (after welding equal corners) not shared by exactly two triangles
+        '''
+        def calc():
+            pts = self.mesh.vectors.reshape(-1, 3)
+            inv = np.unique(pts, axis=0, return_inverse=True)[1].reshape(-1, 3)
+            e = np.vstack([inv[:,[0,1]], inv[:,[1,2]], inv[:,[2,0]]])
+            e.sort(axis=1)
+            e = e[e[:,0] != e[:,1]]
+            counts = np.unique(e, axis=0, return_counts=True)[1]
+            return int(np.count_nonzero(counts != 2))
+        return self.get_metric('nonmanifold_edge_count', calc)
+    
+    def get_z_histogram(self, nbins=100):
+        '''
+        number of triangles whose z extent overlaps each of nbins equal intervals over [minz, maxz]
+        return (counts, bin edges)
+        '''
+        def calc():
+            z = self.mesh.vectors[:,:,2]
+            edges = np.linspace(self.minz, self.maxz, nbins + 1)
+            ilo = np.clip(np.searchsorted(edges, z.min(axis=1), side='right') - 1, 0, nbins - 1)
+            ihi = np.clip(np.searchsorted(edges, z.max(axis=1), side='right') - 1, 0, nbins - 1)
+            d = np.bincount(ilo, minlength=nbins + 1) - np.bincount(ihi + 1, minlength=nbins + 1)
+            return np.cumsum(d)[:nbins], edges
+        return self.get_metric(('z_histogram', nbins), calc)
     
     
 if __name__ == '__main__':
@@ -24,6 +24,7 @@ import scipy.spatial.distance as scid
 import suGraph
 from scipy.signal import savgol_filter
 import css
+import rleslice
 
 class suPath2D:
     """
@@ -297,21 +298,76 @@ class pathEngine:
         self.iso_contours_of_a_region = []
         return
 
-    def generate_contours_from_img(self, imagePath, isRevertImage=False):    
+    def generate_contours_from_img(self, imagePath, isRevertImage=False, origin=(0, 0)):    
         """
-        Read image from imagePath and return 
+        Read image from imagePath, or take the image array of a slice (eg from stl2pngfunc.stl2slices), and return 
+        @origin is the pixel of the image's corner when it is only part of the slice (eg (ix0, iy0) from stl2pngfunc.stl2rois)
+                so the contours come out in the pixel coordinates of the whole slice
         @im reprents a image data
         @contours(python list of list)
         @hiearchy reprensents a matrix, the details can be find in https://docs.opencv.org/trunk/d9/d8b/tutorial_py_contours_hierarchy.html
         """
-        im = cv2.imread(imagePath, cv2.IMREAD_GRAYSCALE)
+        if isinstance(imagePath, np.ndarray):
+            im = imagePath.astype(np.uint8)*255 if imagePath.dtype == bool else imagePath
+        else:
+            im = cv2.imread(imagePath, cv2.IMREAD_GRAYSCALE)
         if isRevertImage :
             im = 255 - im
         ret, thresh = cv2.threshold(im, 127, 255, 1)
        
-        self.im, self.contours, self.hiearchy = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        self.im, self.contours, self.hiearchy = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE, offset=tuple(map(int, origin)))
         return self.im, self.contours, self.hiearchy
 
+    def generate_contours_from_polygons(self, polygons, scale):
+        """
+        Build the contour tree straight from the closed polygons of a vector slice 
+        (eg from stl2pngfunc.stl2polygons) instead of from a slice image, so no findContours is needed.
+        The polygons are unioned by pyclipper, which also works out the holes.
+        @polygons list of (n,2) arrays in the units of the mesh (mm)
+        @scale multiplies the coordinates into the integer units of pyclipper, which they are rounded to,
+               so it sets the precision: 1e4 keeps 0.1 micron, where 1 would round to whole mm.
+               The contours of the tree are in these units (divide by scale for mm), and so are
+               the offsets given to fill_closed_region_with_iso_contours: an offset of d mm is d*scale,
+               eg -0.4*1e4 = -4000 for a 0.4 mm line spacing inwards
+        Return contour tree (in PyPolyNode) in the same form as convert_hiearchy_to_PyPolyTree
+        """
+        pc = pyclipper.Pyclipper()
+        for polygon in polygons:
+            pc.AddPath(np.round(np.asarray(polygon)*scale).astype(np.int64).tolist(), pyclipper.PT_SUBJECT, True)
+        root = pc.Execute2(pyclipper.CT_UNION, pyclipper.PFT_NONZERO)
+        def contours_to_array(node):
+            for n in node.Childs:
+                n.Contour = np.array(n.Contour).reshape((-1,2))
+                contours_to_array(n)
+        contours_to_array(root)
+        self.root_of_region_contour = root
+        return root
+
+    def generate_contours_from_rle(self, rle, connectivity=8):
+        """
+        Build the contour tree straight from a run-length slice (rleslice.RLESlice, eg from stl2pngfunc.stl2rles)
+        with the regions and their boundaries found on the runs, so no image is made.
+        The contours go round the pixel corners (findContours follows the pixel centres instead).
+        @connectivity 8 or 4 for whether pixels touching at a corner are in the same region
+        Return contour tree (in PyPolyNode) with each region's outer contour under the root
+        and its holes under that, as used by get_contours_from_each_connected_region
+        """
+        ncomponents, labels = rle.LabelComponents(connectivity)
+        contours, contourlabels = rle.TraceBoundaries(labels, connectivity)
+        root = pyclipper.PyPolyNode()
+        outers = {}
+        for c, label in sorted(zip(contours, contourlabels), key=lambda cl: rleslice.ContourArea(cl[0]) < 0):
+            node = pyclipper.PyPolyNode()
+            node.Contour = c
+            node.IsOpen = False
+            node.IsHole = label in outers
+            node.Parent = outers.get(label, root)
+            node.Parent.Childs.append(node)
+            if not node.IsHole:
+                outers[label] = node
+        self.root_of_region_contour = root
+        return root
+
     def recusive_add_node(self, node, idx):
         """
         This function  recursively add a child node add a brother node 
@@ -0,0 +1,65 @@
+from trianglezslice import TriZSlice
+
+# slices for looking at before they are finished: every layer is first sliced on a grid coarsefactor
+# times coarser over the same extents, then the layers are refined one at a time to the full
+# resolution starting from the one being viewed and its neighbours
+# the layers can also be previewed one at a time (GetCoarse, CoarseNext) so that a viewer on another thread
+# can show the first of them without waiting for the rest, the slicing only reads tzs and the meshes
+# the refined layers are exactly those of TriZSlice.SliceToROIs on the full grid as they use it directly
+# (the mesh is not decimated for the coarse pass, the bar lookup is already indexed by z so
+# the cost of a layer is in the rows and pixels of the raster)
+class ProgressiveSlicer:
+    def __init__(self, tzs, zs, coarsefactor=4):
+        self.tzs = tzs   # meshes loaded with the full resolution pixel grid built
+        self.zs = list(zs)
+        self.coarse = TriZSlice(False)
+        self.coarse.tbms = tzs.tbms
+        self.coarse.xlo, self.coarse.xhi, self.coarse.ylo, self.coarse.yhi = tzs.xlo, tzs.xhi, tzs.ylo, tzs.yhi
+        self.coarse.zlo, self.coarse.zhi = tzs.zlo, tzs.zhi
+        self.coarse.BuildPixelGridStructures(max(1, tzs.xpixels.nparts//coarsefactor), max(1, tzs.ypixels.nparts//coarsefactor))
+        self.coarsescale = (tzs.xpixels.nparts/self.coarse.xpixels.nparts, tzs.ypixels.nparts/self.coarse.ypixels.nparts)
+        self.coarseimages = [ None ]*len(self.zs)
+        self.rois = [ None ]*len(self.zs)
+
+    def SliceCoarse(self, func=None):
+        for i, img in enumerate(self.coarse.SliceToArrays(self.zs, func)):
+            self.coarseimages[i] = img
+
+    # the coarse image of layer i, slicing it now if it has not been previewed yet
+    def GetCoarse(self, i):
+        if self.coarseimages[i] is None:
+            self.coarseimages[i] = self.coarse.SliceToArray(self.zs[i])
+        return self.coarseimages[i]
+
+    # previews one more layer in the same order as RefineNext and returns its index, or None once all are previewed
+    def CoarseNext(self, iview, nneighbours=2):
+        for i in self.RefineOrder(iview, nneighbours):
+            if self.coarseimages[i] is None:
+                self.GetCoarse(i)
+                return i
+        return None
+
+    def IsRefined(self, i):
+        return self.rois[i] is not None
+
+    # full resolution (image, ix0, iy0) of layer i, slicing it now if it has not been refined yet
+    def GetROI(self, i):
+        if self.rois[i] is None:
+            self.rois[i] = self.tzs.CalcSliceROI(self.tzs.CalcYsegs(self.zs[i]))
+        return self.rois[i]
+
+    # the viewed layer, then outwards through its nneighbours each side, then the rest from the bottom
+    def RefineOrder(self, iview, nneighbours=2):
+        order = [ iview ]
+        for d in range(1, nneighbours + 1):
+            order.extend([ iview - d, iview + d ])
+        order.extend(range(len(self.zs)))
+        return [ i  for i in order  if 0 <= i < len(self.zs) ]
+
+    # refines one more layer and returns its index, or None once all are at full resolution
+    def RefineNext(self, iview, nneighbours=2):
+        for i in self.RefineOrder(iview, nneighbours):
+            if self.rois[i] is None:
+                self.GetROI(i)
+                return i
+        return None
@@ -0,0 +1,149 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+# run-length encoded slice with the white pixels of each row as runs [xlo, xhi) held in flat arrays,
+# the runs of row iy are runxlo[rowstarts[iy]:rowstarts[iy+1]], sorted along the row and never touching
+# (rows and columns are as in the image from TriZSlice.SliceToArrays, so memory goes with the
+# number of runs rather than width*height)
+class RLESlice:
+    def __init__(self, width, height, runrows, runxlo, runxhi):
+        self.width, self.height = width, height
+        self.stride = width + 2   # keys row*stride + x order the runs with room for x-1 and x+1
+        runrows, runxlo, runxhi = [ np.asarray(a, dtype=np.int64).ravel()  for a in (runrows, runxlo, runxhi) ]
+        bkeep = (runxlo < runxhi)
+        keylo, keyhi = (runrows*self.stride + runxlo)[bkeep], (runrows*self.stride + runxhi)[bkeep]
+        iorder = np.argsort(keylo, kind="stable")
+        keylo, keyhi = keylo[iorder], keyhi[iorder]
+
+        # merge runs which overlap or touch into one so that the runs are canonical
+        reachhi = np.maximum.accumulate(keyhi)
+        bnewrun = np.ones(len(keylo), dtype=bool)
+        bnewrun[1:] = (keylo[1:] > reachhi[:-1])
+        istarts = np.nonzero(bnewrun)[0]
+        self.runrows = (keylo[istarts]//self.stride).astype(np.int32)
+        self.runxlo = (keylo[istarts] - self.runrows*np.int64(self.stride)).astype(np.int32)
+        self.runxhi = (np.maximum.reduceat(keyhi, istarts) - self.runrows*np.int64(self.stride)).astype(np.int32) if len(istarts) else np.zeros(0, dtype=np.int32)
+        self.rowstarts = np.searchsorted(self.runrows, np.arange(height + 1))
+
+    def GetArea(self):
+        return int(np.sum(self.runxhi - self.runxlo, dtype=np.int64))
+
+    def ToImage(self):
+        dimg = np.zeros((self.height, self.width + 1), dtype=np.int32)
+        np.add.at(dimg, (self.runrows, self.runxlo), 1)
+        np.add.at(dimg, (self.runrows, self.runxhi), -1)
+        return np.where(np.cumsum(dimg[:, :-1], axis=1) > 0, 255, 0).astype(np.uint8)
+
+    # pairs of runs (i, j) with j in the row below i which share an edge, or a corner when connectivity=8
+    def BelowNeighbours(self, connectivity=8):
+        ext = (1 if connectivity == 8 else 0)
+        keylo = self.runrows.astype(np.int64)*self.stride + self.runxlo
+        keyhi = self.runrows.astype(np.int64)*self.stride + self.runxhi
+        belowlo = keylo + self.stride - ext
+        belowhi = keyhi + self.stride + ext
+        jlo = np.searchsorted(keyhi, belowlo, side="right")   # first run below which ends after xlo
+        jhi = np.searchsorted(keylo, belowhi, side="left")    # first run below which starts from xhi on
+        counts = np.maximum(jhi - jlo, 0)
+        ioffs = np.cumsum(counts) - counts
+        ipairs = np.repeat(np.arange(len(keylo)), counts)
+        jpairs = np.repeat(jlo - ioffs, counts) + np.arange(len(ipairs))
+        return ipairs, jpairs
+
+    # component label of each run, numbered in order of the first run of each component
+    def LabelComponents(self, connectivity=8):
+        nruns = len(self.runrows)
+        ipairs, jpairs = self.BelowNeighbours(connectivity)
+        graph = coo_matrix((np.ones(len(ipairs), dtype=np.int8), (ipairs, jpairs)), shape=(nruns, nruns))
+        ncomponents, labels = connected_components(graph, directed=False)
+        return ncomponents, labels.astype(np.int32)
+
+    def GetComponentAreas(self, labels, ncomponents):
+        return np.bincount(labels, weights=(self.runxhi - self.runxlo), minlength=ncomponents).astype(np.int64)
+
+    def GetComponent(self, labels, label):
+        bsel = (labels == label)
+        return RLESlice(self.width, self.height, self.runrows[bsel], self.runxlo[bsel], self.runxhi[bsel])
+
+    # boundary edges between pixel corners (x, y), directed with the white pixels on their left
+    # taking y as upwards, so outer contours have positive area and holes negative
+    # also the run each vertical edge is the side of, -1 for the horizontal edges
+    def BoundaryEdges(self):
+        # vertical edges up the left end of each run and down its right end
+        nruns = len(self.runrows)
+        vx0 = np.concatenate((self.runxlo, self.runxhi))
+        vy0 = np.concatenate((self.runrows + 1, self.runrows))
+        vy1 = np.concatenate((self.runrows, self.runrows + 1))
+        vrun = np.concatenate((np.arange(nruns), np.arange(nruns)))
+
+        # horizontal edges along each line y where the coverage of row y (A) differs from row y-1 (B)
+        lines = np.concatenate((self.runrows, self.runrows, self.runrows + 1, self.runrows + 1)).astype(np.int64)
+        xs = np.concatenate((self.runxlo, self.runxhi, self.runxlo, self.runxhi))
+        keys = lines*self.stride + xs
+        dA = np.concatenate((np.ones(nruns), -np.ones(nruns), np.zeros(2*nruns))).astype(np.int32)
+        dB = np.concatenate((np.zeros(2*nruns), np.ones(nruns), -np.ones(nruns))).astype(np.int32)
+        iorder = np.argsort(keys, kind="stable")
+        keys, cA, cB = keys[iorder], np.cumsum(dA[iorder]), np.cumsum(dB[iorder])
+        bedge = (keys[1:] > keys[:-1]) & ((cA[:-1] > 0) != (cB[:-1] > 0))
+        hy = keys[:-1][bedge]//self.stride
+        hxa, hxb = keys[:-1][bedge] - hy*self.stride, keys[1:][bedge] - hy*self.stride
+        binA = (cA[:-1][bedge] > 0)   # the row below the line is white so the edge goes along +x
+        hx0, hx1 = np.where(binA, hxa, hxb), np.where(binA, hxb, hxa)
+
+        x0 = np.concatenate((vx0, hx0)); y0 = np.concatenate((vy0, hy))
+        x1 = np.concatenate((vx0, hx1)); y1 = np.concatenate((vy1, hy))
+        erun = np.concatenate((vrun, -np.ones(len(hy), dtype=np.int64)))
+        return x0, y0, x1, y1, erun
+
+    # closed contours round the runs as (n, 2) arrays of pixel corners with the collinear points dropped
+    # and the component label of each, with connectivity matching LabelComponents at the corners
+    # where two pixels meet diagonally
+    def TraceBoundaries(self, labels=None, connectivity=8):
+        if labels is None:
+            ncomponents, labels = self.LabelComponents(connectivity)
+        x0, y0, x1, y1, erun = self.BoundaryEdges()
+        vstride = np.int64(self.width + 1)
+        vstart, vend = y0.astype(np.int64)*vstride + x0, y1.astype(np.int64)*vstride + x1
+        iorder = np.argsort(vstart, kind="stable")
+        vstartsorted = vstart[iorder]
+        jlo = np.searchsorted(vstartsorted, vend, side="left")
+        jhi = np.searchsorted(vstartsorted, vend, side="right")
+
+        # the edge out of the end of each edge, where there are two pick the turn by the connectivity
+        nexts = iorder[np.minimum(jlo, len(iorder) - 1)]
+        bfork = (jhi - jlo == 2)
+        ealt = iorder[np.minimum(jlo + 1, len(iorder) - 1)]
+        dxin, dyin = (x1 - x0), (y1 - y0)
+        cross = dxin*(y1[nexts] - y0[nexts]) - dyin*(x1[nexts] - x0[nexts])
+        bswap = bfork & ((cross > 0) if connectivity == 8 else (cross < 0))
+        nexts = np.where(bswap, ealt, nexts).tolist()
+
+        lerun = erun.tolist()
+        bseen = [ False ]*len(nexts)
+        contours, contourlabels = [ ], [ ]
+        for e0 in range(len(nexts)):
+            if bseen[e0] or lerun[e0] == -1:   # start each contour on a vertical edge for its label
+                continue
+            loop = [ ]
+            e = e0
+            while not bseen[e]:
+                bseen[e] = True
+                loop.append(e)
+                e = nexts[e]
+            pts = np.column_stack((x0[loop], y0[loop]))
+            d = np.diff(np.vstack((pts[-1:], pts, pts[:1])), axis=0)
+            bcorner = (d[:-1, 0]*d[1:, 1] != d[:-1, 1]*d[1:, 0])
+            contours.append(pts[bcorner].astype(np.int32))
+            contourlabels.append(int(labels[lerun[e0]]))
+        return contours, contourlabels
+
+def RLESliceFromImage(img):
+    bwhite = np.zeros((img.shape[0], img.shape[1] + 2), dtype=np.int8)
+    bwhite[:, 1:-1] = (np.asarray(img) > 0)
+    rows, xlo = np.nonzero(np.diff(bwhite, axis=1) == 1)
+    rowshi, xhi = np.nonzero(np.diff(bwhite, axis=1) == -1)
+    return RLESlice(img.shape[1], img.shape[0], rows, xlo, xhi)
+
+def ContourArea(contour):
+    x, y = contour[:, 0].astype(np.float64), contour[:, 1].astype(np.float64)
+    return 0.5*float(np.sum(x*np.roll(y, -1) - np.roll(x, -1)*y))
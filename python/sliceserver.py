@@ -0,0 +1,280 @@
+#!/usr/bin/python
+
+# long running slicer which keeps the meshes warm between requests, so the GUI and batch tools
+# can share it instead of each loading the STL files again (stl2png.py --inputs does one z at a time)
+#
+# a request is one line of json:
+#   {"id": anything, "stl": [ files ], "z": [ zvalues ] or "n": nslices, "format": "raw"|"rle"|"png",
+#    "width": 1200, "height": 0, "extra": "5%", "transform": "unit"}
+# and is answered by one line of json followed by the layers as bytes one after the other:
+#   {"id": .., "format": .., "width": .., "height": .., "xlo": .., "ylo": .., "xpixelsize": .., "ypixelsize": ..,
+#    "zs": [ .. ], "sizes": [ bytes of each layer ]}   or   {"id": .., "error": message}
+# raw layers are height*width uint8 with 255 inside, rle layers are the int32 arrays runrows, runxlo, runxhi
+# of rleslice.RLESlice one after the other, png layers are whole png files
+import sys, os, io, json, shutil, tempfile, threading, socketserver, signal
+from optparse import OptionParser
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from trianglezslice import TriZSlice, meshfields, slicefields
+from trianglebarmesh import TriangleBarMeshArrays
+from meshcache import MeshCache
+from rleslice import RLESlice
+from stl2png import transmaps
+
+parser = OptionParser()
+parser.add_option("-q", "--quiet",      dest="verbose",      default=True,action="store_false",help="Verbose (to stderr)")
+parser.add_option("",   "--socket",     dest="socketpath",   default=None,metavar="FILE",      help="Listen on this unix socket instead of stdin/stdout")
+parser.add_option("",   "--meshes",     dest="maxmeshes",    default=8,type="int",             help="Number of meshes to keep loaded")
+parser.add_option("",   "--workers",    dest="workers",      default=1,type="int",             help="Processes to slice the layers of the requests with")
+parser.add_option("",   "--cache",      dest="cachedir",     default=None,metavar="DIR",       help="Directory to cache the welded meshes in between runs")
+parser.add_option("",   "--cachesize",  dest="cachesize",    default=1024,type="int",          help="Size limit of the mesh cache in MB")
+parser.add_option("",   "--maxmem",     dest="maxmem",       default=0,type="int",             help="Build meshes from the file in chunks within this many MB")
+parser.description = "Serves slices of STL files as raw bitmaps, run lengths or PNGs, keeping the meshes loaded between requests"
+
+# keeps what was written when TriZSlice.WritePNG closes it
+class PNGBuffer(io.BytesIO):
+    def close(self):
+        self.data = self.getvalue()
+        io.BytesIO.close(self)
+
+# the layers of tzs at zs encoded as the bytes of the format
+def EncodeLayers(tzs, zs, fmt):
+    if fmt == "rle":
+        return [ np.concatenate((rle.runrows, rle.runxlo, rle.runxhi)).astype("<i4").tobytes()  for rle in tzs.SliceToRLEs(zs) ]
+    if fmt == "png":
+        layers = [ ]
+        for img in tzs.SliceToArrays(zs):
+            fout = PNGBuffer()
+            tzs.WritePNG(fout, tzs.CompressImage(img))
+            layers.append(fout.data)
+        return layers
+    return [ img.tobytes()  for img in tzs.SliceToArrays(zs) ]
+
+# meshes a worker process of SliceServer has memory mapped from the .npy files of the server, by directory
+workermeshes = { }
+
+def ServerWorkerLayers(meshdirs, grid, zs, fmt):
+    for meshdir in [ d  for d in workermeshes  if not os.path.isdir(d) ]:   # dropped by the server
+        del workermeshes[meshdir]
+    tzs = TriZSlice(False)
+    for meshdir in meshdirs:
+        if meshdir not in workermeshes:
+            tbm = TriangleBarMeshArrays(nodesortaxes=(2, 1, 0))
+            tbm.SetArrays(*[ np.load(os.path.join(meshdir, "%s.npy" % f), mmap_mode="r")  for f in meshfields ])
+            workermeshes[meshdir] = tbm
+        tzs.tbms.append(workermeshes[meshdir])
+    for k, v in grid.items():
+        setattr(tzs, k, v)
+    return EncodeLayers(tzs, zs, fmt)
+
+# a mesh held by SliceServer, loaded by the first request for it while the others wait on loaded
+class ServerMesh:
+    def __init__(self, stlfile):
+        self.stlfile = stlfile
+        self.tbm = None
+        self.error = None   # the exception if the load failed
+        self.loaded = threading.Event()
+        self.meshdir = None   # .npy files of the mesh for the workers, written when first needed
+        self.meshdirlock = threading.Lock()
+        self.users = 0   # requests using it now, it is not dropped until they have finished
+
+class SliceServer:
+    def __init__(self, optionverbose, maxmeshes=8, workers=1, meshcache=None, maxmemory=None):
+        self.optionverbose = optionverbose
+        self.maxmeshes = maxmeshes   # more may be held while requests in progress use them
+        self.meshcache = meshcache   # a meshcache.MeshCache so meshes dropped from memory are quick to get back
+        self.maxmemory = maxmemory
+        self.meshes = OrderedDict()   # (path, mtime, size, transname) -> ServerMesh, least recent first
+        self.lock = threading.Lock()   # guards meshes and the users counts, never held while loading
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(workers) if workers > 1 else None
+        self.meshroot = tempfile.mkdtemp(prefix="sliceserver") if workers > 1 else None
+
+    def Log(self, msg):
+        if self.optionverbose:
+            sys.stderr.write(msg + "\n")
+            sys.stderr.flush()
+
+    # the mesh of the file as it is now on disk, reloaded if the file has changed since
+    # it counts as in use until ReleaseMeshes is called on it
+    def GetMesh(self, stlfile, transname):
+        st = os.stat(stlfile)
+        key = (os.path.abspath(stlfile), st.st_mtime_ns, st.st_size, transname)
+        with self.lock:
+            bload = key not in self.meshes
+            if bload:
+                self.meshes[key] = ServerMesh(stlfile)
+            self.meshes.move_to_end(key)
+            smesh = self.meshes[key]
+            smesh.users += 1
+        if bload:
+            try:
+                tslice = TriZSlice(False)
+                tslice.meshcache, tslice.maxmemory = self.meshcache, self.maxmemory
+                tslice.LoadSTLfile(stlfile, transmaps[transname], transname)
+                smesh.tbm = tslice.tbms[0]
+                self.Log("loaded %s" % stlfile)
+            except Exception as e:
+                smesh.error = e
+                with self.lock:
+                    if self.meshes.get(key) is smesh:
+                        del self.meshes[key]
+            smesh.loaded.set()
+        else:
+            smesh.loaded.wait()
+        if smesh.error is not None:
+            self.ReleaseMeshes([ smesh ])
+            raise smesh.error
+        return smesh
+
+    # done with the meshes, dropping the least recently used ones nothing is using beyond maxmeshes
+    def ReleaseMeshes(self, smeshes):
+        with self.lock:
+            for smesh in smeshes:
+                smesh.users -= 1
+            nover = len(self.meshes) - self.maxmeshes
+            for key, smesh in list(self.meshes.items()):
+                if nover <= 0:
+                    break
+                if smesh.users == 0 and smesh.loaded.is_set():
+                    del self.meshes[key]
+                    if smesh.meshdir is not None:
+                        shutil.rmtree(smesh.meshdir, ignore_errors=True)
+                    self.Log("dropped %s" % key[0])
+                    nover -= 1
+
+    # directory of the mesh as .npy files for the workers to map, written the first time it is needed
+    def GetMeshDir(self, smesh):
+        with smesh.meshdirlock:
+            if smesh.meshdir is None:
+                meshdir = tempfile.mkdtemp(dir=self.meshroot)
+                for f in meshfields:
+                    np.save(os.path.join(meshdir, "%s.npy" % f), getattr(smesh.tbm, f))
+                smesh.meshdir = meshdir
+            return smesh.meshdir
+
+    # (header, layers) answering the request
+    def Slice(self, request):
+        fmt = request.get("format", "raw")
+        if fmt not in ("raw", "rle", "png"):
+            raise ValueError("unknown format %s" % fmt)
+        stlfiles = request["stl"]
+        if isinstance(stlfiles, str):
+            stlfiles = [ stlfiles ]
+        transname = request.get("transform", "unit")
+        smeshes = [ ]
+        try:
+            for stlfile in stlfiles:
+                smeshes.append(self.GetMesh(stlfile, transname))
+            return self.SliceMeshes(request, smeshes, fmt)
+        finally:
+            self.ReleaseMeshes(smeshes)
+
+    def SliceMeshes(self, request, smeshes, fmt):
+        tzs = TriZSlice(False)
+        tzs.tbms = [ smesh.tbm  for smesh in smeshes ]
+        tzs.SetExtents(request.get("extra", "5%"))
+        tzs.BuildPixelGridStructures(int(request.get("width", 1200)), int(request.get("height", 0)))
+        if "n" in request:
+            n = int(request["n"])
+            zs = [ tzs.zlo + (tzs.zhi - tzs.zlo)*(i + 0.5)/n  for i in range(n) ]
+        else:
+            zs = [ float(z)  for z in request["z"] ]
+
+        if self.pool is not None and len(zs) > 1:
+            meshdirs = [ self.GetMeshDir(smesh)  for smesh in smeshes ]
+            grid = dict((k, getattr(tzs, k))  for k in slicefields)
+            nrun = max(1, (len(zs) + self.workers - 1)//self.workers)
+            futures = [ self.pool.submit(ServerWorkerLayers, meshdirs, grid, zs[i:i+nrun], fmt)  for i in range(0, len(zs), nrun) ]
+            layers = [ layer  for future in futures  for layer in future.result() ]
+        else:
+            layers = EncodeLayers(tzs, zs, fmt)
+        header = { "id":request.get("id"), "format":fmt, "width":tzs.xpixels.nparts, "height":tzs.ypixels.nparts,
+                   "xlo":tzs.xpixels.vs[0], "ylo":tzs.ypixels.vs[0],
+                   "xpixelsize":tzs.xpixels.vs[1] - tzs.xpixels.vs[0], "ypixelsize":tzs.ypixels.vs[1] - tzs.ypixels.vs[0],
+                   "zs":zs, "sizes":[ len(layer)  for layer in layers ] }
+        return header, layers
+
+    # answers the json lines from fin onto fout until it closes or sends an empty line
+    def Serve(self, fin, fout):
+        while True:
+            line = fin.readline()
+            if not line.strip():
+                break
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                request, header, layers = { }, { "error":"bad request: %s" % e }, [ ]
+            else:
+                try:
+                    header, layers = self.Slice(request)
+                    self.Log("sliced %d layers of %s" % (len(layers), request["stl"]))
+                except Exception as e:
+                    header, layers = { "id":request.get("id"), "error":"%s: %s" % (type(e).__name__, e) }, [ ]
+            fout.write(json.dumps(header).encode("utf8") + b"\n")
+            for layer in layers:
+                fout.write(layer)
+            fout.flush()
+
+    def Close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.meshroot is not None:
+            shutil.rmtree(self.meshroot, ignore_errors=True)
+
+# reads an answer of SliceServer.Serve from fin, returning the header and the layers as
+# (height, width) uint8 arrays, rleslice.RLESlice objects or png file bytes by the format
+def ReadResponse(fin):
+    header = json.loads(fin.readline())
+    if "error" in header:
+        raise RuntimeError(header["error"])
+    layers = [ ]
+    for size in header["sizes"]:
+        b = fin.read(size)
+        if header["format"] == "raw":
+            layers.append(np.frombuffer(b, dtype=np.uint8).reshape(header["height"], header["width"]))
+        elif header["format"] == "rle":
+            runrows, runxlo, runxhi = np.frombuffer(b, dtype="<i4").reshape(3, -1)
+            layers.append(RLESlice(header["width"], header["height"], runrows, runxlo, runxhi))
+        else:
+            layers.append(b)
+    return header, layers
+
+# sends one request to a server listening on the unix socket and waits for its answer
+def SliceRequest(socketpath, request):
+    import socket
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socketpath)
+        fsock = sock.makefile("rwb")
+        fsock.write(json.dumps(request).encode("utf8") + b"\n")
+        fsock.flush()
+        return ReadResponse(fsock)
+    finally:
+        sock.close()
+
+if __name__ == "__main__":
+    options, args = parser.parse_args()
+    meshcache = MeshCache(options.cachedir, options.cachesize*1024*1024) if options.cachedir else None
+    server = SliceServer(options.verbose, options.maxmeshes, options.workers, meshcache, options.maxmem*1024*1024 or None)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))   # so the pool and the socket are cleaned up
+    try:
+        if options.socketpath:
+            class Handler(socketserver.StreamRequestHandler):
+                def handle(self):
+                    server.Serve(self.rfile, self.wfile)
+            if os.path.exists(options.socketpath):
+                os.remove(options.socketpath)
+            with socketserver.ThreadingUnixStreamServer(options.socketpath, Handler) as sserver:
+                server.Log("listening on %s" % options.socketpath)
+                try:
+                    sserver.serve_forever()
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    os.remove(options.socketpath)
+        else:
+            server.Serve(sys.stdin.buffer, sys.stdout.buffer)
+    finally:
+        server.Close()
@@ -0,0 +1,74 @@
+import os, struct
+import numpy as np
+
+# a stack of slices in one file which is memory mapped rather than decoded, any layer is a view
+# into the file and process pools can share it read-only through the page cache
+# header (little endian), then the z of each layer as float64, then the layers from a page boundary:
+#   magic "SLICEVOL", version, width, height, nlayers, bitpacked, x0, y0, xpixelsize, ypixelsize
+# each layer is height rows of width uint8 (255 inside) or, bitpacked, of (width + 7)//8 bytes
+# with the first pixel in the top bit as np.packbits does
+volmagic = b"SLICEVOL"
+volheader = struct.Struct("<8sIIIII4d")
+volalign = 4096
+
+def VolumeRowBytes(width, bitpacked):
+    return (width + 7)//8 if bitpacked else width
+
+def VolumeDataOffset(nlayers):
+    return -(-(volheader.size + 8*nlayers)//volalign)*volalign
+
+class SliceVolume:
+    def __init__(self, fname):
+        self.Open(fname)
+
+    def Open(self, fname):
+        self.fname = os.path.abspath(fname)   # so it reopens from workers in other directories
+        with open(fname, "rb") as fin:
+            magic, version, self.width, self.height, nlayers, bitpacked, self.x0, self.y0, self.xpixelsize, self.ypixelsize = volheader.unpack(fin.read(volheader.size))
+            assert magic == volmagic and version == 1, ("not a slice volume", fname)
+            self.zs = np.frombuffer(fin.read(8*nlayers), dtype="<f8")
+        self.bitpacked = bool(bitpacked)
+        dataoffset = VolumeDataOffset(nlayers)
+        shape = (nlayers, self.height, VolumeRowBytes(self.width, self.bitpacked))
+        self.layers = np.memmap(fname, dtype=np.uint8, mode="r", offset=dataoffset, shape=shape) if nlayers else np.zeros(shape, dtype=np.uint8)
+
+    # reopened from the file in another process instead of the layers being pickled
+    def __getstate__(self):
+        return self.fname
+
+    def __setstate__(self, fname):
+        self.Open(fname)
+
+    def __len__(self):
+        return len(self.zs)
+
+    # the layer as a (height, width) uint8 image, a view of the file unless it is bitpacked
+    def GetLayer(self, i):
+        if self.bitpacked:
+            return np.unpackbits(self.layers[i], axis=1, count=self.width)*np.uint8(255)
+        return self.layers[i]
+
+    def __getitem__(self, i):
+        return self.GetLayer(i)
+
+# slices the layers of tzs (with its pixel grid built) at zs straight into the volume file
+# written to a temporary name and moved into place once it is complete, func(i) is called after each layer
+def WriteSliceVolume(fname, tzs, zs, bitpacked=False, func=None):
+    zs = list(zs)
+    width, height = tzs.xpixels.nparts, tzs.ypixels.nparts
+    xpixelsize, ypixelsize = tzs.xpixels.vs[1] - tzs.xpixels.vs[0], tzs.ypixels.vs[1] - tzs.ypixels.vs[0]
+    dataoffset = VolumeDataOffset(len(zs))
+    shape = (len(zs), height, VolumeRowBytes(width, bitpacked))
+    tmpfile = fname + ".tmp"
+    with open(tmpfile, "wb") as fout:
+        fout.write(volheader.pack(volmagic, 1, width, height, len(zs), int(bitpacked), tzs.xpixels.vs[0], tzs.ypixels.vs[0], xpixelsize, ypixelsize))
+        fout.write(np.asarray(zs, dtype="<f8").tobytes())
+        fout.truncate(dataoffset + shape[0]*shape[1]*shape[2])
+    if zs:
+        layers = np.memmap(tmpfile, dtype=np.uint8, mode="r+", offset=dataoffset, shape=shape)
+        for i, img in enumerate(tzs.SliceToArrays(zs, func)):
+            layers[i] = np.packbits(img != 0, axis=1) if bitpacked else img
+        layers.flush()
+        del layers
+    os.replace(tmpfile, fname)
+    return SliceVolume(fname)
@@ -4,6 +4,9 @@
 import sys, re
 from optparse import OptionParser
 from trianglezslice import TriZSlice
+from meshcache import MeshCache
+from slicevolume import WriteSliceVolume
+import stlgenerator
 
 parser = OptionParser()
 parser.add_option("-s", "--stl",        dest="stlfiles",     action="append",metavar="FILE",   help="Input STL file")
@@ -16,36 +19,19 @@ parser.add_option("",   "--extra",      dest="extra",        default="5%",
 parser.add_option("-p", "--position",   dest="position",     default="mid",                    help="Position")
 parser.add_option("-n", "--nslices",    dest="nslices",      default=0,type="int",             help="Number of slices to make")
 parser.add_option("-z", "--zlevel",     dest="zlevels",      action="append",                  help="Zlevel values to slice at")
+parser.add_option("",   "--cache",      dest="cachedir",     default=None,metavar="DIR",       help="Directory to cache the welded meshes in between runs")
+parser.add_option("",   "--cachesize",  dest="cachesize",    default=1024,type="int",          help="Size limit of the mesh cache in MB")
+parser.add_option("",   "--maxmem",     dest="maxmem",       default=0,type="int",             help="Build meshes from the file in chunks within this many MB")
+parser.add_option("",   "--workers",    dest="workers",      default=1,type="int",             help="Processes to load the STL files and slice the layers with")
+parser.add_option("",   "--pnglevel",   dest="pnglevel",     default=-1,type="int",            help="zlib compression level of the PNGs, 0 for none and 1 for fastest")
+parser.add_option("",   "--volume",     dest="volumefile",   default=None,metavar="FILE",      help="Write the -n slices into this one memory mappable file instead of PNGs")
+parser.add_option("",   "--bitpack",    dest="bitpack",      default=False,action="store_true",help="Pack 8 pixels to the byte in the --volume file")
 parser.add_option("-i", "--inputs",     dest="cinputs",      default=False,action="store_true",help="Wait for lines from input stream of form 'zvalue [pngfile]\\n'")
 parser.description = "Slices STL files into black and white PNG bitmaps as a batch or on demand"
 parser.epilog = "For more speed try running with pypy"
 
-options, args = parser.parse_args()
-#options, args = parser.parse_args(args=[])  # to run within debugger
-#print(options)
-if not options.stlfiles:
-    parser.print_help()
-    exit(1)
-
-if not options.outputfile:
-    rfile = re.sub("\.stl$(?i)", "", options.stlfiles[0])
-    if options.nslices != 0:
-        options.outputfile = rfile+"_%04d.png"
-    elif options.zlevels:
-        options.outputfile = rfile+"_%010f.png"
-    else:
-        options.outputfile = rfile+".png"
-        
-# load the stl files into trianglebarmeshes
-transmaps = { "unit":lambda t: t, "swapyz": lambda t: (t[0], -t[2], t[1]) }
-
-tzs = TriZSlice(options.verbose)
-for stlfile in options.stlfiles:
-    tzs.LoadSTLfile(stlfile, transmaps[options.transform])
-    
-# Determin the ranges from the loaded files
-tzs.SetExtents(options.extra)
-tzs.BuildPixelGridStructures(options.widthpixels, options.heightpixels)
+# module level functions rather than lambdas so they can be sent to the loading processes
+transmaps = { "unit":None, "swapyz":stlgenerator.transswapyz }
 
 def pngname(optionoutputfile, i, z):
     if re.search("%.*?d(?i)", optionoutputfile):
@@ -53,28 +39,64 @@ def pngname(optionoutputfile, i, z):
     if re.search("%.*?f(?i)", optionoutputfile):
         return optionoutputfile % z
     return optionoutputfile
-    
-if options.nslices != 0:
-    for i in range(options.nslices):
-        z = tzs.zlo + (tzs.zhi - tzs.zlo)*(i + 0.5)/options.nslices
-        tzs.SliceToPNG(z, pngname(options.outputfile, i, z))
 
-i = options.nslices
-for sz in options.zlevels or []:
-    z = float(z)
-    tzs.SliceToPNG(z, pngname(options.outputfile, i, z))
-    i += 1
+if __name__ == "__main__":
+    options, args = parser.parse_args()
+    #options, args = parser.parse_args(args=[])  # to run within debugger
+    #print(options)
+    if not options.stlfiles:
+        parser.print_help()
+        exit(1)
+
+    if not options.outputfile:
+        rfile = re.sub("\.stl$(?i)", "", options.stlfiles[0])
+        if options.nslices != 0:
+            options.outputfile = rfile+"_%04d.png"
+        elif options.zlevels:
+            options.outputfile = rfile+"_%010f.png"
+        else:
+            options.outputfile = rfile+".png"
+        
+    # load the stl files into trianglebarmeshes
+    tzs = TriZSlice(options.verbose)
+    if options.cachedir:
+        tzs.meshcache = MeshCache(options.cachedir, options.cachesize*1024*1024)
+    if options.maxmem:
+        tzs.maxmemory = options.maxmem*1024*1024
+    tzs.compresslevel = options.pnglevel
+    tzs.LoadSTLfiles(options.stlfiles, transmaps[options.transform], options.transform, options.workers)
     
-if options.cinputs:
-    if options.verbose:
-        print("Give zvalue within [%.3f,%.3f] and optionally pngfile name followed by linefeed" % (tzs.zlo, tzs.zhi))
-    while True:
-        cl = sys.stdin.readline().strip()
-        if cl == "":
-            break
-        lcl = cl.split(None, 1)
-        z = float(lcl[0])
-        tzs.SliceToPNG(z, pngname(lcl[1] if len(lcl) == 2 else options.outputfile, i, z))
+    # Determin the ranges from the loaded files
+    tzs.SetExtents(options.extra)
+    tzs.BuildPixelGridStructures(options.widthpixels, options.heightpixels)
+
+    if options.nslices != 0:
+        zs = [ tzs.zlo + (tzs.zhi - tzs.zlo)*(i + 0.5)/options.nslices  for i in range(options.nslices) ]
+        if options.volumefile:
+            WriteSliceVolume(options.volumefile, tzs, zs, options.bitpack)
+        else:
+            pngnames = [ pngname(options.outputfile, i, z)  for i, z in enumerate(zs) ]
+            if options.workers > 1:
+                tzs.SliceToPNGsParallel(zs, pngnames, options.workers)
+            else:
+                tzs.SliceToPNGs(zs, pngnames)
+
+    i = options.nslices
+    for sz in options.zlevels or []:
+        z = float(sz)
+        tzs.SliceToPNG(z, pngname(options.outputfile, i, z))
         i += 1
+    
+    if options.cinputs:
+        if options.verbose:
+            print("Give zvalue within [%.3f,%.3f] and optionally pngfile name followed by linefeed" % (tzs.zlo, tzs.zhi))
+        while True:
+            cl = sys.stdin.readline().strip()
+            if cl == "":
+                break
+            lcl = cl.split(None, 1)
+            z = float(lcl[0])
+            tzs.SliceToPNG(z, pngname(lcl[1] if len(lcl) == 2 else options.outputfile, i, z))
+            i += 1
             
 
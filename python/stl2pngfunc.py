@@ -1,9 +1,12 @@
 from trianglezslice import TriZSlice
+from meshcache import MeshCache
+from slicevolume import WriteSliceVolume
+import stlgenerator
 import re
 
 # load the stl files into trianglebarmeshes
 # slice and return parameters(images, pixel size, min x and min y)
-transmaps = { "unit":lambda t: t, "swapyz": lambda t: (t[0], -t[2], t[1]) }
+transmaps = { "unit":None, "swapyz":stlgenerator.transswapyz }
 
 def pngname(optionoutputfile, i, z):
     if re.search("%.*?d(?i)", optionoutputfile):
@@ -12,20 +15,87 @@ def pngname(optionoutputfile, i, z):
         return optionoutputfile % z
     return optionoutputfile
 
-def stl2png(stlfile, nlayers, image_width, image_height, outfiles, func=None):
+# @tris: triangles of stlfile already loaded (eg ModelInfo.mesh.vectors), then the file is not read again,
+#       or the (verts, faces) of an indexed mesh (see ModelInfo.get_slice_mesh()) which are used as they are
+# @maxmemory: bytes to build the mesh within, for files too large to sort in memory at once
+def loadmesh(stlfile, cachedir=None, tris=None, maxmemory=None):
     tzs = TriZSlice(True)
-    tzs.LoadSTLfile(stlfile, transmaps["unit"])
+    tzs.maxmemory = maxmemory
+    if isinstance(tris, tuple):
+        tzs.LoadIndexed(tris[0], tris[1], stlfile)
+    elif tris is not None:
+        tzs.LoadTriangles(tris, stlfile)
+    else:
+        if cachedir is not None:
+            tzs.meshcache = MeshCache(cachedir)
+        tzs.LoadSTLfile(stlfile, transmaps["unit"], "unit")
     
     extra = "5%"
     tzs.SetExtents(extra)
+    return tzs
+
+def loadslicer(stlfile, image_width, image_height, cachedir=None, tris=None, maxmemory=None):
+    tzs = loadmesh(stlfile, cachedir, tris, maxmemory)
     x_pixel_size, y_pixel_size, x0, y0 = tzs.BuildPixelGridStructures(image_width, image_height)
-    
-    for i in range(nlayers):
-        z = tzs.zlo + (tzs.zhi - tzs.zlo)*(i + 0.5)/nlayers
-        tzs.SliceToPNG(z, pngname(outfiles, i, z))
-        # return current frame number
-        if(func != None):
-            func(i)
+    return tzs, x_pixel_size, y_pixel_size, x0, y0
+
+# @nlayers: number of equal layers to slice in the middle of, or the list of z values to slice at
+#           (eg from ModelInfo.get_slice_layers() with adaptive layers)
+def layerzs(tzs, nlayers):
+    if not isinstance(nlayers, int):
+        return list(nlayers)
+    return [ tzs.zlo + (tzs.zhi - tzs.zlo)*(i + 0.5)/nlayers  for i in range(nlayers) ]
+
+# @workers: processes to slice the layers with, func(i) is still called in layer order
+# @compresslevel: zlib level of the pngs, 0 to store them uncompressed for temporary slices, 1 for fastest
+def stl2png(stlfile, nlayers, image_width, image_height, outfiles, func=None, cachedir=None, tris=None, maxmemory=None, workers=None, compresslevel=-1):
+    tzs, x_pixel_size, y_pixel_size, x0, y0 = loadslicer(stlfile, image_width, image_height, cachedir, tris, maxmemory)
+    tzs.compresslevel = compresslevel
+    zs = layerzs(tzs, nlayers)
+    # func(i) is given the current frame number
+    pngnames = [ pngname(outfiles, i, z)  for i, z in enumerate(zs) ]
+    if workers is not None and workers > 1:
+        tzs.SliceToPNGsParallel(zs, pngnames, workers, func)
+    else:
+        tzs.SliceToPNGs(zs, pngnames, func)
     # added by Yao        
     return x_pixel_size, y_pixel_size, x0, y0  
-          
\ No newline at end of file
+
+# the same slicing as stl2png but the layers are returned as uint8 images (255 inside the model) 
+# for pathEngine.generate_contours_from_img, the pngs are only written if outfiles is given
+def stl2slices(stlfile, nlayers, image_width, image_height, outfiles=None, func=None, cachedir=None, tris=None, maxmemory=None, compresslevel=-1):
+    tzs, x_pixel_size, y_pixel_size, x0, y0 = loadslicer(stlfile, image_width, image_height, cachedir, tris, maxmemory)
+    tzs.compresslevel = compresslevel
+    zs = layerzs(tzs, nlayers)
+    pngnames = [ pngname(outfiles, i, z)  for i, z in enumerate(zs) ] if outfiles is not None else None
+    images = list(tzs.SliceToArrays(zs, func, pngnames))
+    return images, x_pixel_size, y_pixel_size, x0, y0
+
+# the layers as (image, ix0, iy0) of only the box of pixels each one occupies, with ix0, iy0 where the 
+# box is in the whole image (pass them as origin to pathEngine.generate_contours_from_img)
+def stl2rois(stlfile, nlayers, image_width, image_height, func=None, cachedir=None, tris=None, maxmemory=None):
+    tzs, x_pixel_size, y_pixel_size, x0, y0 = loadslicer(stlfile, image_width, image_height, cachedir, tris, maxmemory)
+    rois = list(tzs.SliceToROIs(layerzs(tzs, nlayers), func))
+    return rois, x_pixel_size, y_pixel_size, x0, y0
+
+# the layers as rleslice.RLESlice run-length slices on the same pixel grid as stl2slices
+def stl2rles(stlfile, nlayers, image_width, image_height, func=None, cachedir=None, tris=None, maxmemory=None):
+    tzs, x_pixel_size, y_pixel_size, x0, y0 = loadslicer(stlfile, image_width, image_height, cachedir, tris, maxmemory)
+    rles = list(tzs.SliceToRLEs(layerzs(tzs, nlayers), func))
+    return rles, x_pixel_size, y_pixel_size, x0, y0
+
+# vector slices, each layer a list of closed polygons as (n, 2) arrays in the units of the stl file
+# for pathEngine.generate_contours_from_polygons, there is no raster so no image size
+def stl2polygons(stlfile, nlayers, func=None, cachedir=None, tris=None, maxmemory=None):
+    tzs = loadmesh(stlfile, cachedir, tris, maxmemory)
+    zs = layerzs(tzs, nlayers)
+    layers = list(tzs.SliceToPolygons(zs, func))
+    return layers, zs
+
+# the layers sliced into the single memory mapped file volumefile, returned as a slicevolume.SliceVolume
+# which reads any layer without decoding it and can be handed to process pools
+# @bitpacked: 8 pixels to the byte instead of one
+def stl2volume(stlfile, nlayers, image_width, image_height, volumefile, func=None, cachedir=None, tris=None, maxmemory=None, bitpacked=False):
+    tzs, x_pixel_size, y_pixel_size, x0, y0 = loadslicer(stlfile, image_width, image_height, cachedir, tris, maxmemory)
+    volume = WriteSliceVolume(volumefile, tzs, layerzs(tzs, nlayers), bitpacked, func)
+    return volume, x_pixel_size, y_pixel_size, x0, y0
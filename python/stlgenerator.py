@@ -1,4 +1,31 @@
-import re, struct, math, sys
+import re, struct, math, sys, os, tempfile
+import numpy as np
+
+# record layout of a binary STL facet, field names match numpy-stl's Mesh.dtype
+stldtype = np.dtype([("normals", "<f4", (3,)), ("vectors", "<f4", (3, 3)), ("attr", "<u2", (1,))])
+
+# module level so it can be sent to worker processes
+def transswapyz(t):
+    return (t[0], -t[2], t[1])
+
+def stlbascii(fname):
+    fin = open(fname, "r")
+    try:
+        l = fin.read(1024)
+        return l[:5] == "solid" and not re.search("[^A-Za-z0-9_%\,\.\/\;\:\'\"\+\-\s\r\n]", l[6:])
+    except UnicodeDecodeError:
+        return False
+    finally:
+        fin.close()
+
+# a binary STL for certain, its size is exactly the 84 byte header and the 50 bytes of each facet it counts
+# (ASCII files which fail stlbascii, eg NUL padded or with other characters in the solid name, are not)
+def stlbbinarysize(fname):
+    with open(fname, "rb") as fin:
+        header = fin.read(84)
+    if len(header) < 84:
+        return False
+    return os.path.getsize(fname) == 84 + 50*struct.unpack("<I", header[80:84])[0]
 
 def stlreader(fname, trans=None):
     if trans is None:
@@ -6,19 +33,13 @@ def stlreader(fname, trans=None):
     if trans == 'INCH':
         trans = lambda p: (p[0]*25.4, p[1]*25.4, p[2]*25.4)
 
-    fin = open(fname, "r")
-    try:
-        l = fin.read(1024)
-        bascii = l[:5] == "solid" and not re.search("[^A-Za-z0-9_%\,\.\/\;\:\'\"\+\-\s\r\n]", l[6:])
-        fin.seek(0)
-    except UnicodeDecodeError:
-        bascii = False
-       
+    bascii = stlbascii(fname)
     little_endian = (struct.unpack("<f", struct.pack("@f", 140919.00))[0] == 140919.00)
     nfacets = 0
     ndegenerate = 0
     
     if bascii:
+        fin = open(fname, "r")
         trpts = []
         for l in fin:
             l = l.replace(",", ".") # Catia writes ASCII STL with , as decimal point
@@ -48,6 +69,73 @@ def stlreader(fname, trans=None):
         yield trpts
         fin.read(2) # padding
         nfacets += 1
+
+# binary facets as a structured array memory-mapped on the file (no per-facet python work)
+# mode "c" maps them copy-on-write so they can be changed in place (eg rotated) without touching the file
+def stlreadrecords(fname, mode="r"):
+    nfacets = max(0, (os.path.getsize(fname) - 84) // stldtype.itemsize)  # trailing partial facet ignored as in stlreader
+    if nfacets == 0:
+        return np.zeros(0, dtype=stldtype)
+    return np.memmap(fname, dtype=stldtype, mode=mode, offset=84, shape=(nfacets,))
+
+# ASCII facets pulled in large blocks with the vertex numbers parsed by numpy rather than per line
+# yields a flat float32 array of the vertex coordinates in each block
+def stlasciiblocks(fname, chunksize=1<<24):
+    vertexre = re.compile(rb"vertex\s+([^\r\n]*)")
+    fin = open(fname, "rb")
+    rem = b""
+    while True:
+        chunk = fin.read(chunksize)
+        block = rem + chunk
+        if chunk:
+            i = block.rfind(b"\n") + 1
+            block, rem = block[:i], block[i:]
+        block = block.replace(b",", b".")  # Catia writes ASCII STL with , as decimal point
+        lvertex = vertexre.findall(block)
+        if lvertex:
+            pts = np.fromstring(b" ".join(lvertex).decode("ascii"), dtype=np.float64, sep=" ")
+            if len(pts) != 3*len(lvertex):
+                raise ValueError("bad vertex line in %s" % fname)
+            yield pts.astype(np.float32)
+        if not chunk:
+            break
+    fin.close()
+
+def stlreadascii(fname, chunksize=1<<24):
+    lpts = list(stlasciiblocks(fname, chunksize))
+    pts = np.concatenate(lpts) if lpts else np.zeros(0, dtype=np.float32)
+    return pts[:len(pts) - len(pts) % 9].reshape(-1, 3, 3)
+
+# (N, 3, 3) float32 array of the triangles that stays on disk and is paged in as it is used
+# ASCII files are converted into a temporary binary file in tmpdir which is deleted once unreferenced
+def stlmaparray(fname, tmpdir=None):
+    if not stlbascii(fname):
+        return stlreadrecords(fname)["vectors"]
+    fout = tempfile.TemporaryFile(dir=tmpdir)
+    npts = 0
+    for pts in stlasciiblocks(fname):
+        pts.tofile(fout)
+        npts += len(pts)
+    fout.flush()
+    if npts < 9:
+        return np.zeros((0, 3, 3), dtype=np.float32)
+    return np.memmap(fout, dtype=np.float32, mode="r", shape=(npts//9, 3, 3))
+
+def transarray(vectors, trans):
+    if trans is None:
+        return vectors
+    if trans == 'INCH':
+        return vectors*np.float32(25.4)
+    pts = vectors.reshape(-1, 3)
+    return np.stack(trans(pts.T), axis=1).reshape(vectors.shape)  # trans applied to the x, y, z columns
+
+# (N, 3, 3) float32 array of triangle corners; a read-only view of the mmap when there is no trans
+def stlreadarray(fname, trans=None):
+    if stlbascii(fname):
+        vectors = stlreadascii(fname)
+    else:
+        vectors = stlreadrecords(fname)["vectors"]
+    return transarray(vectors, trans)
     
 if __name__ == "__main__":
     sendactivity("clearalltriangles")
@@ -89,7 +89,8 @@ if __name__ == "__main__":
     
     real_pixel_size, real_pixel_size, gcode_minx, gcode_miny = stl2pngfunc.stl2png(file_path, N, m.image_width, 
                         m.image_height, out_path,
-                        func = lambda i: print("slicing layer {}/{}".format(i+1,N))
+                        func = lambda i: print("slicing layer {}/{}".format(i+1,N)),
+                        tris = m.mesh.vectors
                         )
     
     print('Slicing mesh into ' + out_path)
@@ -0,0 +1,47 @@
+"""
+A check that slicing a mesh with a hole in it (as scans often are) gives a partial slice rather than
+an exception or cuts paired across the wrong triangles.
+A unit cube is sliced through the middle with each of its side triangles removed in turn.
+"""
+import numpy as np
+from trianglebarmesh import TriangleBarMeshArrays
+from trianglezslice import TriZSlice
+
+def cube_triangles():
+    '''
+    the 12 triangles of the unit cube, anticlockwise seen from outside
+    the side triangles (which the plane z=0.5 cuts) are 4 to 11
+    '''
+    v = np.array([[x, y, z]  for z in (0, 1)  for y in (0, 1)  for x in (0, 1)], dtype=np.float64)
+    faces = [(0, 2, 3), (0, 3, 1), (4, 5, 7), (4, 7, 6),     # bottom, top
+             (0, 1, 5), (0, 5, 4), (1, 3, 7), (1, 7, 5),     # y=0, x=1
+             (3, 2, 6), (3, 6, 7), (2, 0, 4), (2, 4, 6)]     # y=1, x=0
+    return v[np.array(faces)]
+
+def slicer(tris):
+    tzs = TriZSlice(False)
+    tzs.tbms.append(TriangleBarMeshArrays(tris=tris, nodesortaxes=(2, 1, 0)))
+    tzs.xlo, tzs.xhi, tzs.ylo, tzs.yhi, tzs.zlo, tzs.zhi = -0.1, 1.1, -0.1, 1.1, 0.0, 1.0
+    tzs.BuildPixelGridStructures(40, 40)
+    return tzs
+
+def test_open_mesh_slices():
+    tris = cube_triangles()
+    tzs = slicer(tris)
+    closed = tzs.SliceToArray(0.5)
+    assert np.count_nonzero(closed) > 0
+    assert len(tzs.CalcSliceLoops(0.5, tzs.tbms[0])) == 1
+    for i in range(4, 12):
+        tzs = slicer(np.delete(tris, i, axis=0))
+        tbm = tzs.tbms[0]
+        cx, cy, icutC = tzs.CalcBarCuts(0.5, tbm)
+        paired = icutC[icutC != -1]
+        assert len(paired) == len(set(paired.tolist())), ("cut paired twice", i)
+        assert np.count_nonzero(icutC == -1) == 1, ("open edge", i)
+        assert tzs.CalcSliceLoops(0.5, tbm) == [ ]   # the only loop runs into the hole
+        img = tzs.SliceToArray(0.5)
+        assert not np.any(img[closed == 0]), ("pixels outside the cube", i)
+
+if __name__ == '__main__':
+    test_open_mesh_slices()
+    print("open mesh slices ok")
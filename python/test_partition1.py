@@ -0,0 +1,39 @@
+"""
+A check that the batch lookups of basicgeo.Partition1 give exactly what the one at a time ones do,
+so that slices made with them do not move by a pixel.
+Random partitions are probed at every boundary, one ulp either side of each and at random values
+in and around the range.
+"""
+import numpy as np
+from basicgeo import Partition1
+
+def probe_values(part, rng, nrandom=2000):
+    vs = np.asarray(part.vs)
+    return np.concatenate((vs, np.nextafter(vs, -np.inf), np.nextafter(vs, np.inf),
+                           rng.uniform(part.lo - 5, part.hi + 5, nrandom)))
+
+def test_boundaries(ntrials=200, seed=1):
+    rng = np.random.default_rng(seed)
+    for trial in range(ntrials):
+        lo = float(rng.uniform(-100, 100))
+        hi = lo + float(rng.uniform(0.1, 300))
+        part = Partition1(lo, hi, int(rng.integers(1, 3000)))
+        assert part.vs.tolist() == [ part.DAlong(i*1.0/part.nparts)  for i in range(part.nparts + 1) ]
+        cand = probe_values(part, rng)
+
+        inrange = cand[(cand >= lo) & (cand <= hi)]
+        assert part.GetParts(inrange).tolist() == [ part.GetPart(v)  for v in inrange.tolist() ]
+
+        a, b = rng.choice(cand, 3000), rng.choice(cand, 3000)
+        vlos, vhis = np.minimum(a, b), np.maximum(a, b)
+        ilos, ihis = part.GetPartRanges(vlos, vhis)
+        for vlo, vhi, ilo, ihi in zip(vlos.tolist(), vhis.tolist(), ilos.tolist(), ihis.tolist()):
+            try:
+                r = part.GetPartRange(vlo, vhi)
+            except AssertionError:   # the scalar code does not handle these either
+                continue
+            assert r == (ilo, ihi), (lo, hi, part.nparts, vlo, vhi, r, (ilo, ihi))
+
+if __name__ == '__main__':
+    test_boundaries()
+    print("Partition1 batch lookups match")
@@ -1,5 +1,8 @@
 from basicgeo import P3, AlongAcc, I1
 import stlgenerator
+import meshreader
+import numpy as np
+import os, tempfile
 
 class TriangleNode:   # replace with just P3
     def __init__(self, p, i):
@@ -44,16 +47,210 @@ class TriangleBar:
         return self.barforeright and (self.barforeright.GetNodeFore(self.nodefore == self.barforeright.nodeback).i > self.nodeback.i)
         
 
+# welds the corners and pairs up the bars of an (N, 3, 3) triangle array with sorts over whole arrays
+# nodes are numbered in lexicographic order of their coordinates taken in nodesortaxes order
+# and bars in order of (nodeback, nodefore), giving the same numbering as the original object-by-object build
+# returns nodes (V,3) and per bar nodeback, nodefore, barforeright, barbackleft (-1 for none)
+def BuildBarArrays(tris, nodesortaxes=(0, 1, 2)):
+    pts = np.asarray(tris, dtype=np.float64).reshape(-1, 3)
+    
+    # strip out duplicates in the corner points of the triangles
+    iorder = np.lexsort([ pts[:, a]  for a in reversed(nodesortaxes) ])  # stable, so equal points keep corner order
+    spts = pts[iorder]
+    bnewnode = np.ones(len(spts), dtype=bool)
+    bnewnode[1:] = np.any(spts[1:] != spts[:-1], axis=1)
+    nodes = spts[bnewnode]
+    jpts = np.empty(len(pts), dtype=np.int64)
+    jpts[iorder] = np.cumsum(bnewnode) - 1
+    jtrs = jpts.reshape(-1, 3)
+    del spts, iorder, bnewnode, jpts
+    return (nodes,) + BuildBarPairs(len(nodes), jtrs)
+
+# the same for a mesh whose corners are already shared (OFF or OBJ), so there is no welding to do
+# the vertices are only renumbered into nodesortaxes order
+def BuildBarArraysIndexed(verts, faces, nodesortaxes=(0, 1, 2)):
+    verts = np.asarray(verts, dtype=np.float64)
+    iorder = np.lexsort([ verts[:, a]  for a in reversed(nodesortaxes) ])
+    jnode = np.empty(len(verts), dtype=np.int64)
+    jnode[iorder] = np.arange(len(verts))
+    return (verts[iorder],) + BuildBarPairs(len(verts), jnode[faces])
+
+# bars and their links from the (N, 3) node indexes of the triangles
+def BuildBarPairs(nnodes, jtrs):
+    # the barcycles (half edges) around each triangle whose points are all distinct
+    jtrs = jtrs[(jtrs[:,0] != jtrs[:,1]) & (jtrs[:,0] != jtrs[:,2]) & (jtrs[:,1] != jtrs[:,2])]
+    ja, jb = jtrs.reshape(-1), jtrs[:, [1, 2, 0]].reshape(-1)
+    hnext = np.arange(len(ja)).reshape(-1, 3)[:, [1, 2, 0]].reshape(-1)
+    hforeright = ja < jb    # half edge runs back to fore so the next bar is its barforeright, otherwise its barbackleft
+    hback, hfore = np.minimum(ja, jb), np.maximum(ja, jb)
+    del jtrs, ja, jb
+    
+    # strip out duplicates of bars where two triangles meet, a backleft half edge followed by a foreright one
+    ekey = hback*nnodes + hfore
+    ihorder = np.lexsort((hforeright, ekey))
+    sekey, sforeright = ekey[ihorder], hforeright[ihorder]
+    bmerged = np.zeros(len(ihorder), dtype=bool)
+    bmerged[1:] = (sekey[1:] == sekey[:-1]) & ~sforeright[:-1] & sforeright[1:]
+    hbar = np.empty(len(ihorder), dtype=np.int64)
+    hbar[ihorder] = np.cumsum(~bmerged) - 1
+    del ekey, sekey, sforeright
+    
+    kept = ihorder[~bmerged]
+    nodeback, nodefore = hback[kept], hfore[kept]
+    barforeright = np.full(len(kept), -1, dtype=np.int64)
+    barbackleft = np.full(len(kept), -1, dtype=np.int64)
+    barforeright[hbar[hforeright]] = hbar[hnext[hforeright]]
+    barbackleft[hbar[~hforeright]] = hbar[hnext[~hforeright]]
+    return nodeback, nodefore, barforeright, barbackleft
+    
+
+# records spilled into one file a run of each bucket at a time, so any number of buckets needs only one open file
+# the records of a bucket read back in the order they were written
+class BucketSpill:
+    def __init__(self, fname, dtype, nbuckets):
+        self.fname, self.dtype = fname, dtype
+        self.fout = open(fname, "wb")
+        self.runs = [ [ ]  for k in range(nbuckets) ]   # (first record, number of records) in the file
+        self.nrecs = 0
+
+    def Write(self, recs, ib):
+        iorder = np.argsort(ib, kind="stable")
+        ks, starts = np.unique(ib[iorder], return_index=True)
+        recs[iorder].tofile(self.fout)
+        ends = np.append(starts[1:], len(ib))
+        for k, i0, i1 in zip(ks.tolist(), starts.tolist(), ends.tolist()):
+            self.runs[k].append((self.nrecs + i0, i1 - i0))
+        self.nrecs += len(ib)
+
+    def Read(self, k):
+        if not self.fout.closed:
+            self.fout.close()
+        with open(self.fname, "rb") as fin:
+            lrecs = [ np.zeros(0, dtype=self.dtype) ]
+            for i0, n in self.runs[k]:
+                fin.seek(i0*self.dtype.itemsize)
+                lrecs.append(np.fromfile(fin, dtype=self.dtype, count=n))
+        return np.concatenate(lrecs)
+
+# BuildBarArrays with a bounded working set for meshes too big to sort in memory at once
+# tris is only read chunkntris triangles at a time (eg a memmap from stlgenerator.stlmaparray) and trans applied to each chunk
+# the corner points are spilled to buckets by their whole sort key (so flat faces full of equal z still split)
+# and the half edges by their back node,
+# each bucket is small enough to sort on its own and the buckets are in order, so the result is identical to BuildBarArrays
+def BuildBarArraysStreamed(tris, nodesortaxes=(0, 1, 2), trans=None, maxbytes=1<<30, tmpdir=None):
+    ntris = len(tris)
+    bytespercorner = 120   # working set of sorting one corner or half edge record, with the lexsort indexes and copies
+    if 3*ntris*bytespercorner <= maxbytes:
+        return BuildBarArrays(stlgenerator.transarray(np.asarray(tris), trans), nodesortaxes)
+    chunkntris = max(1024, maxbytes//(8*bytespercorner))
+    nbuckets = int(3*ntris*bytespercorner//maxbytes) + 2
+    def chunks():
+        for t0 in range(0, ntris, chunkntris):
+            t1 = min(ntris, t0 + chunkntris)
+            yield t0, t1, np.asarray(stlgenerator.transarray(np.asarray(tris[t0:t1]), trans), dtype=np.float64).reshape(-1, 3)
+
+    with tempfile.TemporaryDirectory(dir=tmpdir) as spilldir:
+        ptdtype = np.dtype([("p", "<f8", (3,)), ("i", "<i8")])
+        hdtype = np.dtype([("back", "<i8"), ("fore", "<i8"), ("foreright", "?"), ("h", "<i8")])
+        jpts = np.memmap(os.path.join(spilldir, "jpts"), dtype=np.int64, mode="w+", shape=(3*ntris,))
+        hbar = np.memmap(os.path.join(spilldir, "hbar"), dtype=np.int64, mode="w+", shape=(3*ntris,))
+        
+        # bucket boundaries on the sort key (nodesortaxes in turn) from a sample of the corners, equal points always share a bucket
+        keydtype = np.dtype([ ("k%d" % a, "<f8")  for a in nodesortaxes ])
+        def sortkeys(pts):
+            keys = np.empty(len(pts), dtype=keydtype)
+            for a in nodesortaxes:
+                keys["k%d" % a] = pts[:, a]
+            return keys
+        sample = np.asarray(stlgenerator.transarray(np.asarray(tris[::max(1, ntris//max(100000, 20*nbuckets))]), trans), dtype=np.float64).reshape(-1, 3)
+        skeys = np.sort(sortkeys(sample))
+        edges = np.unique(skeys[(np.arange(1, nbuckets)*len(skeys))//nbuckets])
+        spill = BucketSpill(os.path.join(spilldir, "p"), ptdtype, len(edges) + 1)
+        for t0, t1, pts in chunks():
+            recs = np.empty(len(pts), dtype=ptdtype)
+            recs["p"] = pts
+            recs["i"] = np.arange(3*t0, 3*t1)
+            spill.Write(recs, np.searchsorted(edges, sortkeys(pts), side="right"))
+        
+        # strip out duplicates in the corner points of the triangles, bucket by bucket
+        lnodes = [ ]
+        nnodes = 0
+        for k in range(len(edges) + 1):
+            recs = spill.Read(k)
+            iorder = np.lexsort([ recs["p"][:, a]  for a in reversed(nodesortaxes) ])
+            spts = recs["p"][iorder]
+            bnewnode = np.ones(len(spts), dtype=bool)
+            bnewnode[1:] = np.any(spts[1:] != spts[:-1], axis=1)
+            lnodes.append(spts[bnewnode])
+            jpts[recs["i"][iorder]] = nnodes + np.cumsum(bnewnode) - 1
+            nnodes += len(lnodes[-1])
+            del recs, iorder, spts, bnewnode
+        os.remove(spill.fname)
+        nodes = np.concatenate(lnodes)
+        del lnodes
+        
+        # the barcycles of each good triangle spilled into buckets of their back node ranges
+        def hchunks():
+            for t0 in range(0, ntris, chunkntris):
+                t1 = min(ntris, t0 + chunkntris)
+                jtrs = np.asarray(jpts[3*t0:3*t1]).reshape(-1, 3)
+                bgood = (jtrs[:,0] != jtrs[:,1]) & (jtrs[:,0] != jtrs[:,2]) & (jtrs[:,1] != jtrs[:,2])
+                h = np.arange(3*t0, 3*t1).reshape(-1, 3)[bgood].reshape(-1)
+                ja, jb = jtrs[bgood].reshape(-1), jtrs[bgood][:, [1, 2, 0]].reshape(-1)
+                yield h, ja, jb
+        nodebucketedges = np.linspace(0, nnodes, nbuckets + 1)[1:-1].astype(np.int64)
+        spill = BucketSpill(os.path.join(spilldir, "h"), hdtype, nbuckets)
+        for h, ja, jb in hchunks():
+            recs = np.empty(len(h), dtype=hdtype)
+            recs["back"], recs["fore"] = np.minimum(ja, jb), np.maximum(ja, jb)
+            recs["foreright"] = ja < jb
+            recs["h"] = h
+            spill.Write(recs, np.searchsorted(nodebucketedges, recs["back"], side="right"))
+        
+        # strip out duplicates of bars where two triangles meet, records are in creation order within each bucket
+        lnodeback, lnodefore = [ ], [ ]
+        nbars = 0
+        for k in range(nbuckets):
+            recs = spill.Read(k)
+            ekey = recs["back"]*nnodes + recs["fore"]
+            ihorder = np.lexsort((recs["foreright"], ekey))
+            sekey, sforeright = ekey[ihorder], recs["foreright"][ihorder]
+            bmerged = np.zeros(len(ihorder), dtype=bool)
+            bmerged[1:] = (sekey[1:] == sekey[:-1]) & ~sforeright[:-1] & sforeright[1:]
+            hbar[recs["h"][ihorder]] = nbars + np.cumsum(~bmerged) - 1
+            kept = ihorder[~bmerged]
+            lnodeback.append(recs["back"][kept].astype(np.int32))
+            lnodefore.append(recs["fore"][kept].astype(np.int32))
+            nbars += len(kept)
+            del recs, ekey, ihorder, sekey, sforeright, bmerged, kept
+        os.remove(spill.fname)
+        nodeback, nodefore = np.concatenate(lnodeback), np.concatenate(lnodefore)
+        del lnodeback, lnodefore
+        
+        # link each bar to the next bar round its triangles
+        barforeright = np.full(nbars, -1, dtype=np.int32)
+        barbackleft = np.full(nbars, -1, dtype=np.int32)
+        for h, ja, jb in hchunks():
+            hb = np.asarray(hbar[h])
+            hbnext = hb.reshape(-1, 3)[:, [1, 2, 0]].reshape(-1)
+            hforeright = ja < jb
+            barforeright[hb[hforeright]] = hbnext[hforeright]
+            barbackleft[hb[~hforeright]] = hbnext[~hforeright]
+        del jpts, hbar
+    return nodes, nodeback, nodefore, barforeright, barbackleft
+    
+
 class TriangleBarMesh:
-    def __init__(self, fname=None, trans=None, nodesortkey=lambda X:X):
+    def __init__(self, fname=None, trans=None, nodesortaxes=(0, 1, 2), tris=None):
         self.nodes = [ ]
         self.bars = [ ]
-        self.nodesortkey = nodesortkey
+        self.nodesortaxes = nodesortaxes
         #self.xlo, self.xhi, self.ylo, self.yhi  # set in NewNode()
 
         if fname is not None:
-            sr = stlgenerator.stlreader(fname, trans)
-            self.BuildTriangleBarmesh(sr)
+            tris = stlgenerator.stlreadarray(fname, trans)
+        if tris is not None:   # (N, 3, 3) array of triangle corners
+            self.BuildTriangleBarmesh(tris)
             r0 = max(map(abs, (self.xlo, self.xhi, self.ylo, self.yhi, self.zlo, self.zhi)))
             assert r0 < 100000, ("triangles too far from origin", r0)
             #sendactivity("triangles", codetriangles=tbm.GetBarMeshTriangles())
@@ -86,54 +283,22 @@ class TriangleBarMesh:
         
     # possibly should be a completely separate class, even though it reuses the same topological structure things
     def BuildTriangleBarmesh(self, trpts):
-        # strip out duplicates in the corner points of the triangles
-        ipts, jtrs = [ ], [ ]
-        for i, tr in enumerate(trpts):
-            ipts.append((tr[0:3], i*3+0))
-            ipts.append((tr[3:6], i*3+1))
-            ipts.append((tr[6:9], i*3+2))
-            jtrs.append([-1, -1, -1])
-            
-        ipts.sort(key=self.nodesortkey)
-        prevpt = None
-        for pt, i3 in ipts:
-            if not prevpt or prevpt != pt:
-                self.NewNode(P3(pt[0], pt[1], pt[2]))
-                prevpt = pt
-            jtrs[i3 // 3][i3 % 3] = len(self.nodes) - 1
-        del ipts
-        
-        # create the barcycles around each triangle
-        tbars = [ ]
-        for jt0, jt1, jt2 in jtrs:
-            if jt0 != jt1 and jt0 != jt2 and jt1 != jt2:  # are all the points distinct?
-                tbars.append(jt0 < jt1 and TriangleBar(self.nodes[jt0], self.nodes[jt1]) or TriangleBar(self.nodes[jt1], self.nodes[jt0]))
-                tbars.append(jt1 < jt2 and TriangleBar(self.nodes[jt1], self.nodes[jt2]) or TriangleBar(self.nodes[jt2], self.nodes[jt1]))
-                tbars.append(jt2 < jt0 and TriangleBar(self.nodes[jt2], self.nodes[jt0]) or TriangleBar(self.nodes[jt0], self.nodes[jt2]))
-                tbars[-3].SetForeRightBL(jt0 < jt1, tbars[-2]) 
-                tbars[-2].SetForeRightBL(jt1 < jt2, tbars[-1]) 
-                tbars[-1].SetForeRightBL(jt2 < jt0, tbars[-3]) 
-        del jtrs
-        
-        # strip out duplicates of bars where two triangles meet
-        tbars.sort(key=lambda bar: (bar.nodeback.i, bar.nodefore.i, not bar.barbackleft))
-        prevbar = None
-        for bar in tbars:
-            if prevbar and prevbar.nodeback == bar.nodeback and prevbar.nodefore == bar.nodefore and \
-                    prevbar.barbackleft and not prevbar.barforeright and not bar.barbackleft and bar.barforeright:
-                prevbar.barforeright = bar.barforeright
-                node2 = bar.barforeright.GetNodeFore(bar.nodefore == bar.barforeright.nodeback)
-                bar2 = bar.barforeright.GetForeRightBL(bar.nodefore == bar.barforeright.nodeback)
-                assert bar2.GetNodeFore(bar2.nodeback == node2) == bar.nodeback
-                assert bar2.GetForeRightBL(bar2.nodeback == node2) == bar
-                bar2.SetForeRightBL(bar2.nodeback == node2, prevbar)
-                prevbar = None
-            else:
-                prevbar = bar
-                assert prevbar.i == -1
-                prevbar.i = len(self.bars)
-                self.bars.append(bar)
-        del tbars
+        if not isinstance(trpts, np.ndarray):
+            trpts = np.array(list(trpts), dtype=np.float64)
+        elif trpts.dtype.names is not None:   # records from stlgenerator.stlreadrecords
+            trpts = trpts["vectors"]
+        nodes, nodeback, nodefore, barforeright, barbackleft = BuildBarArrays(trpts, self.nodesortaxes)
+        if len(nodes):
+            self.xlo, self.ylo, self.zlo = nodes.min(axis=0).tolist()
+            self.xhi, self.yhi, self.zhi = nodes.max(axis=0).tolist()
+        self.nodes = [ TriangleNode(P3(*p), i)  for i, p in enumerate(nodes.tolist()) ]
+        self.bars = [ TriangleBar(self.nodes[jb], self.nodes[jf])  for jb, jf in zip(nodeback.tolist(), nodefore.tolist()) ]
+        for i, bar, jfr, jbl in zip(range(len(self.bars)), self.bars, barforeright.tolist(), barbackleft.tolist()):
+            bar.i = i
+            if jfr != -1:
+                bar.barforeright = self.bars[jfr]
+            if jbl != -1:
+                bar.barbackleft = self.bars[jbl]
         
 
     def GetBarMeshTriangles(self):
@@ -163,3 +328,119 @@ class TriangleBarMesh:
         
             
 
+        
+
+# same topology as TriangleBarMesh held as flat arrays instead of node and bar objects
+# (the node index of a bar end stands in for the TriangleNode, -1 for a missing bar)
+class TriangleBarMeshArrays:
+    def __init__(self, fname=None, trans=None, nodesortaxes=(0, 1, 2), tris=None, maxbytes=None, verts=None, faces=None):
+        self.nodesortaxes = nodesortaxes
+        self.nodes = np.zeros((0, 3))
+        self.nodeback = self.nodefore = self.barforeright = self.barbackleft = np.zeros(0, dtype=np.int32)
+        self.barzlo = self.barzhi = np.zeros(0)
+
+        if fname is not None and meshreader.bindexedfile(fname):   # OFF or OBJ
+            self.SetArrays(*BuildBarArraysIndexed(*meshreader.indexedreader(fname, trans), nodesortaxes=nodesortaxes))
+        elif verts is not None:   # an indexed mesh already in memory
+            self.SetArrays(*BuildBarArraysIndexed(verts, faces, nodesortaxes=nodesortaxes))
+        elif maxbytes is not None:   # bounded memory ingest, the triangles are streamed from disk
+            if fname is not None:
+                tris = stlgenerator.stlmaparray(fname)
+            elif tris.dtype.names is not None:
+                tris = tris["vectors"]
+            self.SetArrays(*BuildBarArraysStreamed(tris, nodesortaxes, trans, maxbytes))
+        elif fname is not None:
+            tris = stlgenerator.stlreadarray(fname, trans)
+            self.BuildTriangleBarmesh(tris)
+        elif tris is not None:   # (N, 3, 3) array of triangle corners
+            self.BuildTriangleBarmesh(tris)
+        if len(self.nodes):
+            r0 = max(map(abs, (self.xlo, self.xhi, self.ylo, self.yhi, self.zlo, self.zhi)))
+            assert r0 < 100000, ("triangles too far from origin", r0)
+
+    def BuildTriangleBarmesh(self, trpts):
+        if not isinstance(trpts, np.ndarray):
+            trpts = np.array(list(trpts), dtype=np.float64)
+        elif trpts.dtype.names is not None:   # records from stlgenerator.stlreadrecords
+            trpts = trpts["vectors"]
+        nodes, nodeback, nodefore, barforeright, barbackleft = BuildBarArrays(trpts, self.nodesortaxes)
+        self.SetArrays(nodes, nodeback, nodefore, barforeright, barbackleft)
+        
+    def SetArrays(self, nodes, nodeback, nodefore, barforeright, barbackleft):
+        self.nodes = np.ascontiguousarray(nodes, dtype=np.float64)
+        self.nodeback = nodeback.astype(np.int32, copy=False)
+        self.nodefore = nodefore.astype(np.int32, copy=False)
+        self.barforeright = barforeright.astype(np.int32, copy=False)
+        self.barbackleft = barbackleft.astype(np.int32, copy=False)
+        self.barzlo = self.nodes[self.nodeback, 2]   # z-range of each bar
+        self.barzhi = self.nodes[self.nodefore, 2]
+        self.zbucketbars = None   # built on the first GetZCrossingBars
+        if len(self.nodes):
+            self.xlo, self.ylo, self.zlo = self.nodes.min(axis=0).tolist()
+            self.xhi, self.yhi, self.zhi = self.nodes.max(axis=0).tolist()
+
+    # bucket grid over z listing every bar in each bucket its z-range touches (flat bar list with bucket offsets)
+    # the bucket width is set so the bars are listed about twice over, which keeps long bars from blowing it up
+    def BuildZBuckets(self):
+        ibars = np.nonzero(self.barzlo < self.barzhi)[0]   # flat bars never cross a z-plane
+        zlo, zhi = self.barzlo[ibars], self.barzhi[ibars]
+        sumextent = float(np.sum(zhi - zlo))
+        self.nzbuckets = max(1, min(len(ibars), int((self.zhi - self.zlo)*len(ibars)/sumextent))) if sumextent > 0.0 else 1
+        self.zbucketwidth = (self.zhi - self.zlo)/self.nzbuckets if sumextent > 0.0 else 1.0
+        blo, bhi = self.ZBuckets(zlo), self.ZBuckets(zhi)
+        counts = bhi - blo + 1
+        ioffs = np.cumsum(counts) - counts
+        ebars = np.repeat(ibars, counts)
+        ebuckets = np.repeat(blo - ioffs, counts) + np.arange(len(ebars))
+        iorder = np.argsort(ebuckets, kind="stable")   # keeps the bars ascending within each bucket
+        self.zbucketbars = ebars[iorder].astype(np.int32)
+        self.zbucketstarts = np.searchsorted(ebuckets[iorder], np.arange(self.nzbuckets + 1))
+
+    def ZBuckets(self, zs):
+        return np.clip(np.floor((zs - self.zlo)/self.zbucketwidth), 0, self.nzbuckets - 1).astype(np.int64)
+
+    # ascending indexes of the bars with barzlo <= z < barzhi, only looking in the bucket of z
+    def GetZCrossingBars(self, z):
+        if not len(self.nodes):
+            return np.zeros(0, dtype=np.int32)
+        if self.zbucketbars is None:
+            self.BuildZBuckets()
+        b = int(self.ZBuckets(np.float64(z)))
+        cbars = self.zbucketbars[self.zbucketstarts[b]:self.zbucketstarts[b+1]]
+        return cbars[(self.barzlo[cbars] <= z) & (z < self.barzhi[cbars])]
+
+
+    def GetNodePoint(self, i):
+        return P3(*self.nodes[i].tolist())
+    def GetBarPoints(self, i):
+        return (self.GetNodePoint(self.nodeback[i]), self.GetNodePoint(self.nodefore[i]))
+    def GetNodeFore(self, i, bfore):
+        return self.nodefore[i] if bfore else self.nodeback[i]
+    def GetForeRightBL(self, i, bforeright):
+        return self.barforeright[i] if bforeright else self.barbackleft[i]
+    def GetTriPoints(self, i):
+        bar1 = self.barforeright[i]
+        node2 = self.GetNodeFore(bar1, self.nodefore[i] == self.nodeback[bar1])
+        return (self.GetNodePoint(self.nodeback[i]), self.GetNodePoint(self.nodefore[i]), self.GetNodePoint(node2))
+        
+    # third node of the triangle on the foreright side of each bar, -1 where there is none
+    def BarNode2s(self):
+        bar1 = self.barforeright
+        bhas = (bar1 != -1)
+        node2 = np.where(self.nodeback[bar1] == self.nodefore, self.nodefore[bar1], self.nodeback[bar1])
+        return np.where(bhas, node2, -1)
+        
+    # each triangle is listed once from the bar which has its lowest indexed node at the back
+    def TriangleBars(self):
+        node2 = self.BarNode2s()
+        return np.nonzero(node2 > self.nodeback)[0], node2
+        
+    def GetBarMeshTriangles(self):
+        ibars, node2 = self.TriangleBars()
+        tris = np.hstack((self.nodes[self.nodeback[ibars]], self.nodes[self.nodefore[ibars]], self.nodes[node2[ibars]]))
+        return list(map(tuple, tris.tolist()))
+        
+    def GetFacts(self):
+        ibars, node2 = self.TriangleBars()
+        nsinglesidededges = int(np.count_nonzero((self.barforeright == -1) | (self.barbackleft == -1)))
+        return (len(self.nodes), len(self.nodeback), len(ibars), nsinglesidededges)
@@ -1,6 +1,44 @@
-from basicgeo import P2, P3, Partition1, Along
-from trianglebarmesh import TriangleBarMesh
-import zlib, struct, time
+from basicgeo import Partition1
+from trianglebarmesh import TriangleBarMeshArrays
+from meshcache import MeshCache
+from rleslice import RLESlice
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import zlib, struct, time, os, tempfile, shutil
+
+meshfields = ("nodes", "nodeback", "nodefore", "barforeright", "barbackleft")
+slicefields = ("xlo", "xhi", "ylo", "yhi", "zlo", "zhi", "xpixels", "ypixels", "xpixmidsE", "ypixmidsE", "compresslevel")
+
+# runs in a worker process of TriZSlice.LoadSTLfiles and hands the mesh back as an uncompressed 
+# .npz of its flat arrays in the temp directory, instead of pickling it through the pool
+def BuildMeshFile(stlfile, transmap, cacheargs, maxmemory):
+    if cacheargs is not None:
+        cachedir, maxbytes, transname = cacheargs
+        tbm = MeshCache(cachedir, maxbytes).GetMesh(stlfile, transmap, transname, nodesortaxes=(2, 1, 0), maxmemory=maxmemory)
+    else:
+        tbm = TriangleBarMeshArrays(stlfile, transmap, nodesortaxes=(2, 1, 0), maxbytes=maxmemory)
+    fd, meshfile = tempfile.mkstemp(suffix=".npz")
+    with os.fdopen(fd, "wb") as fout:
+        np.savez(fout, **dict((f, getattr(tbm, f))  for f in meshfields))
+    return meshfile
+
+# state of a worker process of TriZSlice.SliceToPNGsParallel, which maps the meshes 
+# read-only from the .npy files written by the parent rather than having them pickled over
+workertzs = None
+
+def InitSliceWorker(meshdir, nmeshes, grid, optionverbose):
+    global workertzs
+    workertzs = TriZSlice(optionverbose)
+    for k in range(nmeshes):
+        tbm = TriangleBarMeshArrays(nodesortaxes=(2, 1, 0))
+        tbm.SetArrays(*[ np.load(os.path.join(meshdir, "%d_%s.npy" % (k, f)), mmap_mode="r")  for f in meshfields ])
+        workertzs.tbms.append(tbm)
+    for k, v in grid.items():
+        setattr(workertzs, k, v)
+
+def SliceWorkerLayers(zs, pngnames):
+    workertzs.SliceToPNGs(zs, pngnames)
+    return len(zs)
 
 class TriZSlice:
     def __init__(self, optionverbose):
@@ -9,12 +47,51 @@ class TriZSlice:
                          # eg like support material structures, 
                          # though these may have a better definition than triangle files
                          # such as branching lines and variable offset radii
+        self.meshcache = None   # a meshcache.MeshCache to reuse meshes built by earlier runs
+        self.maxmemory = None   # bytes, build meshes from the file in bounded memory chunks
+        self.compresslevel = -1   # zlib level of the pngs, 0 stores them uncompressed and 1 is fastest
         
-    def LoadSTLfile(self, stlfile, transmap):
-        tbm = TriangleBarMesh(stlfile, transmap, nodesortkey=lambda X:(X[0][2], X[0][1], X[0][0], X[1]))  # every edge has nodefrom.p.z<=nodeto.p.z
+    def LoadSTLfile(self, stlfile, transmap, transname=None):
+        if self.meshcache is not None and transname is not None:
+            tbm = self.meshcache.GetMesh(stlfile, transmap, transname, nodesortaxes=(2, 1, 0), maxmemory=self.maxmemory)
+        else:
+            tbm = TriangleBarMeshArrays(stlfile, transmap, nodesortaxes=(2, 1, 0), maxbytes=self.maxmemory)  # every edge has nodefrom.p.z<=nodeto.p.z
+        self.AddMesh(tbm, stlfile)
+
+    # builds the meshes of several files (eg a part and its support bodies) concurrently in a process pool
+    # transmap is sent to the workers so must be picklable (None, 'INCH' or a module level function)
+    def LoadSTLfiles(self, stlfiles, transmap, transname=None, workers=None):
+        if workers == 1 or len(stlfiles) <= 1:
+            for stlfile in stlfiles:
+                self.LoadSTLfile(stlfile, transmap, transname)
+            return
+        cacheargs = None
+        if self.meshcache is not None and transname is not None:
+            cacheargs = (self.meshcache.cachedir, self.meshcache.maxbytes, transname)
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [ pool.submit(BuildMeshFile, stlfile, transmap, cacheargs, self.maxmemory)  for stlfile in stlfiles ]
+            for stlfile, future in zip(stlfiles, futures):
+                meshfile = future.result()
+                try:
+                    with np.load(meshfile) as d:
+                        tbm = TriangleBarMeshArrays(nodesortaxes=(2, 1, 0))
+                        tbm.SetArrays(*[ d[f]  for f in meshfields ])
+                finally:
+                    os.remove(meshfile)
+                self.AddMesh(tbm, stlfile)
+
+    # triangles already in memory, eg ModelInfo.mesh.vectors, so the file is not parsed a second time
+    def LoadTriangles(self, tris, name="mesh"):
+        self.AddMesh(TriangleBarMeshArrays(tris=tris, nodesortaxes=(2, 1, 0), maxbytes=self.maxmemory), name)
+
+    # an indexed mesh already in memory (eg ModelInfo.verts and faces from an OFF or OBJ), its shared corners are not welded again
+    def LoadIndexed(self, verts, faces, name="mesh"):
+        self.AddMesh(TriangleBarMeshArrays(verts=verts, faces=faces, nodesortaxes=(2, 1, 0)), name)
+
+    def AddMesh(self, tbm, name):
         if self.optionverbose:
             nnodes, nedges, ntriangles, nsinglesidededges = tbm.GetFacts()
-            print("%s:  nodes=%d edges=%d triangles=%d singlesidededges=%d" % (stlfile, nnodes, nedges, ntriangles, nsinglesidededges))
+            print("%s:  nodes=%d edges=%d triangles=%d singlesidededges=%d" % (name, nnodes, nedges, ntriangles, nsinglesidededges))
             if nsinglesidededges != 0:
                 print("*** Warning, not a closed surface")
         self.tbms.append(tbm)
@@ -63,88 +140,145 @@ class TriZSlice:
         # added by Yao
         return xpixwid, ypixwid, self.xpixels.vs[0], self.ypixels.vs[0]
 
-    def CalcPixelYcuts(self, z, tbm):
-        tbarpairs = [ ]
-        barcuts = { }
-        for bar in tbm.bars:   # bucketing could speed this up
-            assert bar.nodeback.p.z <= bar.nodefore.p.z
-            if bar.nodeback.p.z <= z < bar.nodefore.p.z:
-                bar1 = bar.barforeright
-                node2 = bar1.GetNodeFore(bar1.nodeback == bar.nodefore)
-                barC = bar1 if node2.p.z <= z else bar1.GetForeRightBL(bar1.nodeback == bar.nodefore)
-                tbarpairs.append((bar.i, barC.i))
-                
-                lam = (z - bar.nodeback.p.z)/(bar.nodefore.p.z - bar.nodeback.p.z)
-                cx = Along(lam, bar.nodeback.p.x, bar.nodefore.p.x)
-                cy = Along(lam, bar.nodeback.p.y, bar.nodefore.p.y)
-                barcuts[bar.i] = P2(cx, cy)
-
-        ycuts = [ []  for iy in range(self.ypixels.nparts) ]  # plural for set of all raster rows
-        for i, i1 in tbarpairs:
-            p0, p1 = barcuts[i], barcuts[i1]
-            iyl, iyh = self.ypixmidsE.GetPartRange(min(p0.v, p1.v), max(p0.v, p1.v))
-            for iy in range(iyl, iyh):
-                yc = self.ypixmidsE.vs[iy+1]
-                assert (p0.v < yc) != (p1.v < yc)
-                lam = (yc - p0.v)/(p1.v - p0.v)
-                xc = Along(lam, p0.u, p1.u)
-                ycuts[iy].append(xc)
-
-        return ycuts
+    # points (cx, cy) where the ascending bars ibars cut the plane at z, and the index in ibars of 
+    # the cut of barC across the triangle on the foreright side of each, which is -1 on an open edge
+    # ibars are the bars crossing z when already known, as from SweepZCrossingBars
+    def CalcBarCuts(self, z, tbm, ibars=None):
+        if ibars is None:
+            ibars = tbm.GetZCrossingBars(z)
+        bar1 = tbm.barforeright[ibars]
+        bopen = (bar1 == -1)   # open edge, no triangle on that side
+        bar1 = np.where(bopen, 0, bar1)   # any bar to index with, the result is masked out
+        bback1 = (tbm.nodeback[bar1] == tbm.nodefore[ibars])
+        node2 = np.where(bback1, tbm.nodefore[bar1], tbm.nodeback[bar1])
+        barC = np.where(tbm.nodes[node2, 2] <= z, bar1, np.where(bback1, tbm.barforeright[bar1], tbm.barbackleft[bar1]))
+        barC[bopen] = -1
+        
+        # points where the bars cut the plane
+        pback, pfore = tbm.nodes[tbm.nodeback[ibars]], tbm.nodes[tbm.nodefore[ibars]]
+        lam = (z - pback[:,2])/(pfore[:,2] - pback[:,2])
+        cx = pback[:,0]*(1 - lam) + pfore[:,0]*lam   # Along(lam, ...)
+        cy = pback[:,1]*(1 - lam) + pfore[:,1]*lam
+        # barC has no cut when the triangle runs into an open edge of the mesh, so check it was found in ibars
+        icutC = np.minimum(np.searchsorted(ibars, barC), max(len(ibars) - 1, 0))
+        icutC = np.where((barC != -1) & (ibars[icutC] == barC), icutC, -1) if len(ibars) else icutC
+        return cx, cy, icutC
+        
+    # x cuts of all the raster rows through the slice of tbm at z, as one array sorted by row and then x
+    # with the cuts of row iy in xcs[rowstarts[iy]:rowstarts[iy+1]]
+    def CalcPixelYcuts(self, z, tbm, ibars=None):
+        cx, cy, icutC = self.CalcBarCuts(z, tbm, ibars)
+
+        # segment across each triangle from the cut of a bar to the cut of barC 
+        iseg0 = np.nonzero(icutC != -1)[0]   # open edge, has no cut to pair with
+        iseg1 = icutC[iseg0]
+        u0, v0, u1, v1 = cx[iseg0], cy[iseg0], cx[iseg1], cy[iseg1]
+        
+        # each segment crosses the row lines ypixmidsE.vs[iy+1] which are in vlo < yc <= vhi
+        jlo = np.maximum(np.searchsorted(self.ypixmidsE.vs, np.minimum(v0, v1), side="right"), 1)
+        jhi = np.minimum(np.searchsorted(self.ypixmidsE.vs, np.maximum(v0, v1), side="right"), self.ypixels.nparts + 1)
+        counts = np.maximum(jhi - jlo, 0)
+        ioffs = np.cumsum(counts) - counts
+        iseg = np.repeat(np.arange(len(counts)), counts)
+        jrow = np.repeat(jlo - ioffs, counts) + np.arange(len(iseg))
+        yc = self.ypixmidsE.vs[jrow]
+        lam = (yc - v0[iseg])/(v1[iseg] - v0[iseg])
+        xc = u0[iseg]*(1 - lam) + u1[iseg]*lam   # Along(lam, p0.u, p1.u)
         
-    def ConsolidateYCutSingular(self, ycutlist):
-        Lycuts = [ ]
-        for i, ycuts in enumerate(ycutlist):
-            ycuts.sort()
-            for j, yc in enumerate(ycuts):
-                Lycuts.append((yc, i, (j%2==1)))
-        Lycuts.sort()
-        Li = set()
-        ysegs = [ ]
-        yclo = -1.0
-        for yc, i, bout in Lycuts:
-            if bout:
-                Li.remove(i)
-                if len(Li) == 0:
-                    ychi = yc
-                    ysegs.append((yclo, ychi))
-            else:
-                if len(Li) == 0:
-                    yclo = yc
-                assert i not in Li
-                Li.add(i)
-        assert len(Li) == 0
-        return ysegs
-
-    def CalcYsegrasters(self, z):
-        ysegrasters = [ ]
-        ycutsList = [ self.CalcPixelYcuts(z, tbm)  for tbm in self.tbms ]
-        for iy in range(self.ypixels.nparts):  # work through each raster line across the list of stlfiles
-            ycutlist = [ ycuts[iy]  for ycuts in ycutsList ]
-            ysegs = self.ConsolidateYCutSingular(ycutlist)
-            ysegrasters.append(ysegs)
-        return ysegrasters
+        iorder = np.lexsort((xc, jrow))
+        rowstarts = np.searchsorted(jrow[iorder], np.arange(1, self.ypixels.nparts + 2))
+        return xc[iorder], rowstarts
+        
+    # closed polygons of the slice of tbm at z as (n, 2) arrays, chained from cut to cut around 
+    # the triangles without rasterizing, so they are as exact as the mesh 
+    # chains which run into an open edge of the mesh are left out
+    def CalcSliceLoops(self, z, tbm, ibars=None):
+        cx, cy, icutC = self.CalcBarCuts(z, tbm, ibars)
+        nexts = icutC.tolist()
+        bseen = [ False ]*len(nexts)
+        loops = [ ]
+        for i0 in range(len(nexts)):
+            loop = [ ]
+            i = i0
+            while i != -1 and not bseen[i]:
+                bseen[i] = True
+                loop.append(i)
+                i = nexts[i]
+            if i == i0 and len(loop) >= 3:
+                loops.append(np.column_stack((cx[loop], cy[loop])))
+        return loops
+
+    # closed polygons of all the meshes at z, where they overlap they are still separate polygons
+    # (see pathEngine.generate_contours_from_polygons for the union into a contour tree with holes)
+    def CalcSlicePolygons(self, z, ibarsList=None):
+        polygons = [ ]
+        for tbm, ibars in zip(self.tbms, ibarsList or [ None ]*len(self.tbms)):
+            polygons.extend(self.CalcSliceLoops(z, tbm, ibars))
+        return polygons
+
+    # union of the spans inside the meshes along every raster row at once, as flat arrays (rows, xlo, xhi) in row order
+    # the cuts of each mesh along a row pair up into spans (a last unpaired cut is dropped), the ends of the spans
+    # are ordered by row, x, mesh and then starts before ends, and the running count of the spans covering 
+    # each point gives where the union starts (count up from 0) and ends (count back down to 0)
+    def ConsolidateYCuts(self, ycutsList):
+        rows, xs, imeshes, bouts = [ ], [ ], [ ], [ ]
+        for i, (xcs, rowstarts) in enumerate(ycutsList):
+            counts = np.diff(rowstarts)
+            row = np.repeat(np.arange(len(counts)), counts)
+            j = np.arange(len(xcs)) - np.repeat(rowstarts[:-1], counts)
+            bkeep = (j < np.repeat(counts - counts%2, counts))
+            rows.append(row[bkeep])
+            xs.append(xcs[bkeep])
+            imeshes.append(np.full(np.count_nonzero(bkeep), i))
+            bouts.append(j[bkeep]%2 == 1)
+        rows, xs, imeshes, bouts = [ np.concatenate(a)  for a in (rows, xs, imeshes, bouts) ]
+        iorder = np.lexsort((bouts, imeshes, xs, rows))
+        rows, xs, bouts = rows[iorder], xs[iorder], bouts[iorder]
+        cover = np.cumsum(np.where(bouts, -1, 1))
+        bstart = ~bouts & (cover == 1)
+        bend = bouts & (cover == 0)
+        return rows[bstart], xs[bstart], xs[bend]
+
+    # active-edge table of tbm swept up through the zs, yielding the bars crossing each z in turn
+    # bars join as the plane reaches their barzlo and drop out once it reaches their barzhi, 
+    # so a whole ascending run of layers costs one pass over the bars
+    def SweepZCrossingBars(self, zs, tbm):
+        izlo = np.argsort(tbm.barzlo, kind="stable")
+        zlosorted = tbm.barzlo[izlo]
+        active = izlo[:0]
+        k, zprev = 0, None
+        for z in zs:
+            if zprev is not None and z < zprev:   # not ascending, start the sweep again from the bottom
+                active, k = izlo[:0], 0
+            k1 = int(np.searchsorted(zlosorted, z, side="right"))
+            active = np.concatenate((active, izlo[k:k1]))
+            active = active[z < tbm.barzhi[active]]
+            k, zprev = k1, z
+            yield np.sort(active)
+
+    # spans inside the slice at z along all the raster rows as the flat arrays (segrows, segxlo, segxhi) in row order
+    def CalcYsegs(self, z, ibarsList=None):
+        ycutsList = [ ]
+        for tbm, ibars in zip(self.tbms, ibarsList or [ None ]*len(self.tbms)):
+            ycutsList.append(self.CalcPixelYcuts(z, tbm, ibars))
+        return self.ConsolidateYCuts(ycutsList)
+
+    # the spans of CalcYsegs as a list for each raster row of (xlo, xhi) tuples
+    def CalcYsegrasters(self, z, ibarsList=None):
+        segrows, segxlo, segxhi = self.CalcYsegs(z, ibarsList)
+        ysegs = list(zip(segxlo.tolist(), segxhi.tolist()))
+        rowstarts = np.searchsorted(segrows, np.arange(self.ypixels.nparts + 1)).tolist()
+        return [ ysegs[rowstarts[iy]:rowstarts[iy+1]]  for iy in range(self.ypixels.nparts) ]
         
-    def CalcNakedCompressedBitmap(self, ysegrasters):
-        compressor = zlib.compressobj()
-        lcompressed = []
-        def addcompressl(s):
-            c = compressor.compress(s)
-            if c:
-                lcompressed.append(c)
-        blackline = b"\0"*(self.xpixels.nparts+1)
-        whiteline = b"\xFF"*self.xpixels.nparts
-        assert len(ysegrasters) == self.ypixels.nparts
-        for ysegs in ysegrasters:
-            previxhl = -1  # to get an extra \0 at the start
-            for yseg in ysegs:
-                ixl, ixh = self.xpixmidsE.GetPartRange(yseg[0], yseg[1])
-                addcompressl(blackline[:ixl-previxhl])
-                addcompressl(whiteline[:ixh-ixl])
-                previxhl = ixh
-            addcompressl(blackline[:self.xpixels.nparts-previxhl])
-        lcompressed.append(compressor.flush())
-        return lcompressed
+    def CalcNakedCompressedBitmap(self, ysegs):
+        return self.CompressImage(self.CalcSliceImage(ysegs))
+
+    # png image data of the rows each with its filter type 0 byte in front, compressed in one go
+    def CompressImage(self, img):
+        assert img.shape == (self.ypixels.nparts, self.xpixels.nparts)
+        rows = np.zeros((img.shape[0], img.shape[1] + 1), dtype=np.uint8)
+        rows[:, 1:] = img
+        return [ zlib.compress(rows.tobytes(), self.compresslevel) ]
             
     # this is a very low volume implementation of the PNG standard
     def WritePNG(self, fout, lcompressed):
@@ -167,10 +301,9 @@ class TriZSlice:
         fout.write(struct.pack("!I4sI", 0, block, bcrc&0xFFFFFFFF))
         fout.close()
 
-    def SliceToPNG(self, z, pngname):
+    def SliceToPNG(self, z, pngname, ibarsList=None):
         stime = time.time()
-        ysegrasters = self.CalcYsegrasters(z)
-        lcompressed = self.CalcNakedCompressedBitmap(ysegrasters)
+        lcompressed = self.CalcNakedCompressedBitmap(self.CalcYsegs(z, ibarsList))
         self.WritePNG(open(pngname, "wb"), lcompressed)
         if self.optionverbose:
             print("Sliced at z=%f to file %s  compressbytes=%d %dms" % (z, pngname, sum(map(len, lcompressed)), (time.time()-stime)*1000))
@@ -180,3 +313,109 @@ class TriZSlice:
         #    conts.extend([[(yseg[0], tzs.ypixmidsE.vs[iy+1]), (yseg[1], tzs.ypixmidsE.vs[iy+1])]  for yseg in ysegs])
         #sendactivity(contours=conts)
 
+    # batch of layers sliced with one sweep of the active-edge table per mesh (fastest when zs is ascending)
+    # func(i) is called after each layer is written
+    def SliceToPNGs(self, zs, pngnames, func=None):
+        zs = list(zs)
+        sweeps = [ self.SweepZCrossingBars(zs, tbm)  for tbm in self.tbms ]
+        for i, (z, pngname) in enumerate(zip(zs, pngnames)):
+            self.SliceToPNG(z, pngname, [ next(sweep)  for sweep in sweeps ])
+            if func is not None:
+                func(i)
+
+    # runs of consecutive layers sliced concurrently in a process pool, func(i) is still called in layer order
+    # the meshes are written once to .npy files in a temp directory which the workers memory map
+    def SliceToPNGsParallel(self, zs, pngnames, workers, func=None):
+        zs, pngnames = list(zs), list(pngnames)
+        nrun = max(1, len(zs)//(workers*8))   # several runs per worker so the progress keeps moving
+        meshdir = tempfile.mkdtemp(prefix="trizslice")
+        try:
+            for k, tbm in enumerate(self.tbms):
+                for f in meshfields:
+                    np.save(os.path.join(meshdir, "%d_%s.npy" % (k, f)), getattr(tbm, f))
+            grid = dict((k, getattr(self, k))  for k in slicefields)
+            with ProcessPoolExecutor(workers, initializer=InitSliceWorker, initargs=(meshdir, len(self.tbms), grid, self.optionverbose)) as pool:
+                futures = [ (i, pool.submit(SliceWorkerLayers, zs[i:i+nrun], pngnames[i:i+nrun]))  for i in range(0, len(zs), nrun) ]
+                for i, future in futures:
+                    for j in range(i, i + future.result()):
+                        if func is not None:
+                            func(j)
+        finally:
+            shutil.rmtree(meshdir, ignore_errors=True)
+
+    # pixel runs [runxlo, runxhi) of each row of the slice which are white, from the spans of CalcYsegs
+    def CalcSliceRuns(self, ysegs):
+        segrows, segxlo, segxhi = ysegs
+        runxlo, runxhi = self.xpixmidsE.GetPartRanges(segxlo, segxhi)
+        return segrows.astype(np.int64), runxlo, runxhi
+
+    # slice as a (ypixels, xpixels) uint8 image with 255 inside
+    def CalcSliceImage(self, ysegs):
+        return self.CalcRunsImage(self.CalcSliceRuns(ysegs), 0, 0, self.xpixels.nparts, self.ypixels.nparts)
+
+    # the pixels [ix0, ix1) x [iy0, iy1) of the runs as an image, filled from the run ends with a cumulative sum
+    def CalcRunsImage(self, runs, ix0, iy0, ix1, iy1):
+        runrows, runxlo, runxhi = runs
+        dimg = np.zeros((iy1 - iy0, ix1 - ix0 + 1), dtype=np.int32)
+        np.add.at(dimg, (runrows - iy0, runxlo - ix0), 1)
+        np.add.at(dimg, (runrows - iy0, runxhi - ix0), -1)
+        return np.where(np.cumsum(dimg[:, :-1], axis=1) > 0, 255, 0).astype(np.uint8)
+
+    # the image of only the bounding box of the white pixels of the slice, and the pixel (ix0, iy0) of its corner
+    # the margin of black pixels round it means contours traced in it are as in the whole image
+    # an empty slice is a single black pixel
+    def CalcSliceROI(self, ysegs, margin=1):
+        runrows, runxlo, runxhi = self.CalcSliceRuns(ysegs)
+        bwhite = (runxlo < runxhi)
+        if not bwhite.any():
+            return np.zeros((1, 1), dtype=np.uint8), 0, 0
+        ix0, ix1 = max(0, int(runxlo[bwhite].min()) - margin), min(self.xpixels.nparts, int(runxhi[bwhite].max()) + margin)
+        iy0, iy1 = max(0, int(runrows[bwhite].min()) - margin), min(self.ypixels.nparts, int(runrows[bwhite].max()) + 1 + margin)
+        return self.CalcRunsImage((runrows[bwhite], runxlo[bwhite], runxhi[bwhite]), ix0, iy0, ix1, iy1), ix0, iy0
+
+    # the same pixels as CalcSliceImage as a rleslice.RLESlice of the white runs of each row
+    def CalcSliceRLE(self, ysegs):
+        return RLESlice(self.xpixels.nparts, self.ypixels.nparts, *self.CalcSliceRuns(ysegs))
+
+    def SliceToArray(self, z, ibarsList=None):
+        return self.CalcSliceImage(self.CalcYsegs(z, ibarsList))
+
+    # images of a batch of layers in memory, sliced with the same sweep as SliceToPNGs 
+    # pngnames is an optional sink for writing them out as well, func(i) is called after each layer
+    def SliceToArrays(self, zs, func=None, pngnames=None):
+        zs = list(zs)
+        sweeps = [ self.SweepZCrossingBars(zs, tbm)  for tbm in self.tbms ]
+        for i, z in enumerate(zs):
+            img = self.CalcSliceImage(self.CalcYsegs(z, [ next(sweep)  for sweep in sweeps ]))
+            if pngnames is not None:
+                self.WritePNG(open(pngnames[i], "wb"), self.CompressImage(img))
+            yield img
+            if func is not None:
+                func(i)
+
+    # vector slices of a batch of layers with the same sweep as SliceToPNGs, no pixel grid is needed
+    def SliceToPolygons(self, zs, func=None):
+        zs = list(zs)
+        sweeps = [ self.SweepZCrossingBars(zs, tbm)  for tbm in self.tbms ]
+        for i, z in enumerate(zs):
+            yield self.CalcSlicePolygons(z, [ next(sweep)  for sweep in sweeps ])
+            if func is not None:
+                func(i)
+
+    # run-length slices of a batch of layers, which for thin walled parts are much smaller than the images
+    def SliceToRLEs(self, zs, func=None):
+        zs = list(zs)
+        sweeps = [ self.SweepZCrossingBars(zs, tbm)  for tbm in self.tbms ]
+        for i, z in enumerate(zs):
+            yield self.CalcSliceRLE(self.CalcYsegs(z, [ next(sweep)  for sweep in sweeps ]))
+            if func is not None:
+                func(i)
+
+    # (image, ix0, iy0) of the occupied part of each of a batch of layers (see CalcSliceROI)
+    def SliceToROIs(self, zs, func=None):
+        zs = list(zs)
+        sweeps = [ self.SweepZCrossingBars(zs, tbm)  for tbm in self.tbms ]
+        for i, z in enumerate(zs):
+            yield self.CalcSliceROI(self.CalcYsegs(z, [ next(sweep)  for sweep in sweeps ]))
+            if func is not None:
+                func(i)